@@ -0,0 +1,193 @@
+"""
+    Benchmark of the geoadmin API on the synthetic dataset
+
+    python dev/manage.py geoadmin_benchmark --objects 10000 --output bench.json
+"""
+import json
+import platform
+import random
+import statistics
+import subprocess
+import time
+import tracemalloc
+
+from tests.models import Building, DeliveryJob, Waypoint
+
+import django
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.contrib.gis.geos import GeometryCollection, Point, Polygon
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+
+from geoadmin import __version__
+
+
+class Rollback(Exception):
+    """Raised to roll the generated dataset back"""
+
+
+class Command(BaseCommand):
+    help = 'Measures the geoadmin API latency, queries, memory and payload on the synthetic dataset'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--objects', type=int, default=10000, help='Number of generated objects of every model')
+        parser.add_argument('--sizes', type=float, nargs='+', default=[0.01, 0.05, 0.1], help='Window sizes in degrees')
+        parser.add_argument('--repeat', type=int, default=5, help='Number of measurements of every target')
+        parser.add_argument('--center', type=float, nargs=2, default=[30., 50.], help='Longitude and latitude of the dataset center')
+        parser.add_argument('--spread', type=float, default=1., help='Size of the dataset area in degrees')
+        parser.add_argument('--seed', type=int, default=1, help='Random seed of the dataset')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Number of objects inserted at once')
+        parser.add_argument('--keep', action='store_true', help='Keep the generated dataset in the database')
+        parser.add_argument('--reuse', action='store_true', help='Use objects existing in the database instead of generating them')
+        parser.add_argument('--output', help='File to store results in the JSON format, stdout is used if not set')
+        parser.add_argument('--compare', help='File containing results of the previous run to compare with')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                if not options['reuse']:
+                    self.generate(options)
+                results = self.run(options)
+                if not options['keep']:
+                    raise Rollback()
+        except Rollback:
+            pass
+        if options['compare']:
+            with open(options['compare']) as f:
+                self.compare(json.load(f), results)
+        content = json.dumps(results, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(content)
+        else:
+            self.stdout.write(content)
+
+    def generate(self, options):
+        """Generates the synthetic dataset"""
+        rnd = random.Random(options['seed'])
+        lon, lat = options['center']
+        spread = options['spread']
+
+        def point():
+            return Point(lon + (rnd.random() - 0.5) * spread, lat + (rnd.random() - 0.5) * spread, srid=4326)
+
+        def building():
+            x, y = point().coords
+            size = rnd.random() * 0.0005 + 0.0001
+            return GeometryCollection(Polygon.from_bbox((x, y, x + size, y + size)), srid=4326)
+
+        count = options['objects']
+        Waypoint.objects.bulk_create((
+            Waypoint(name='Waypoint %s' % i, waypoint=point()) for i in range(count)
+        ), batch_size=options['batch_size'])
+        DeliveryJob.objects.bulk_create((
+            DeliveryJob(name='Delivery %s' % i, kind='wood', pickup_point=point(), dropoff_point=point()) for i in range(count)
+        ), batch_size=options['batch_size'])
+        Building.objects.bulk_create((
+            Building(name='Building %s' % i, levels=rnd.randint(1, 20), geometry=building()) for i in range(count)
+        ), batch_size=options['batch_size'])
+        with connection.cursor() as cursor:
+            for model in (Waypoint, DeliveryJob, Building):
+                cursor.execute('ANALYZE %s' % connection.ops.quote_name(model._meta.db_table))
+
+    def run(self, options):
+        """Measures all targets on all window sizes"""
+        user = User(username='geoadmin_benchmark', is_staff=True, is_superuser=True, is_active=True)
+        results = []
+        for model in (Waypoint, DeliveryJob, Building):
+            model_admin = admin.site._registry[model]
+            info = model._meta.app_label, model._meta.model_name
+            path = reverse('admin:%s_%s_geoadmin_api' % info)
+            view = resolve(path).func
+            for size in options['sizes']:
+                lon, lat = options['center']
+                data = {
+                    'south': lat - size / 2., 'west': lon - size / 2.,
+                    'north': lat + size / 2., 'east': lon + size / 2.,
+                    'zoom': 14,
+                }
+
+                def request():
+                    r = RequestFactory().get(path, data=data)
+                    r.user = user
+                    return r
+
+                targets = {
+                    'list_json': lambda: model_admin.geoadmin_list_json(request(), model_admin.get_queryset(request())),
+                    'serialize': lambda: model_admin.geoadmin_serialize(request(), model_admin.get_queryset(request())),
+                    'api': lambda: self.content(view(request())),
+                }
+                for name, target in targets.items():
+                    results.append({
+                        'model': model._meta.label_lower,
+                        'size': size,
+                        'target': name,
+                        **self.measure(target, options['repeat']),
+                    })
+                    self.stderr.write('%(model)s %(size)s %(target)s: %(median).4fs' % {
+                        **results[-1], 'median': results[-1]['latency']['median']
+                    })
+        return {
+            'geoadmin': __version__,
+            'commit': self.commit(),
+            'django': django.get_version(),
+            'python': platform.python_version(),
+            'database': connection.vendor,
+            'objects': {model._meta.label_lower: model.objects.count() for model in (Waypoint, DeliveryJob, Building)},
+            'results': results,
+        }
+
+    def measure(self, target, repeat):
+        """Measures latency, number of queries, peak memory and payload size of the target"""
+        latency = []
+        for i in range(repeat):
+            started = time.perf_counter()
+            target()
+            latency.append(time.perf_counter() - started)
+        with CaptureQueriesContext(connection) as queries:
+            tracemalloc.start()
+            value = target()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        if isinstance(value, dict):
+            value = json.dumps(value, default=str)
+        return {
+            'latency': {
+                'min': min(latency),
+                'median': statistics.median(latency),
+                'max': max(latency),
+            },
+            'queries': len(queries.captured_queries),
+            'peak_memory': peak,
+            'bytes': len(value.encode('utf-8') if isinstance(value, str) else value),
+        }
+
+    def compare(self, previous, results):
+        """Reports changes of the median latency, queries and payload size comparing with the previous results"""
+        measured = {(r['model'], r['size'], r['target']): r for r in previous['results']}
+        for r in results['results']:
+            p = measured.get((r['model'], r['size'], r['target']))
+            if not p:
+                continue
+            self.stderr.write('%s %s %s: latency x%.2f, queries %+d, bytes %+d' % (
+                r['model'], r['size'], r['target'],
+                r['latency']['median'] / (p['latency']['median'] or 1e-9),
+                r['queries'] - p['queries'], r['bytes'] - p['bytes'],
+            ))
+
+    def content(self, response):
+        """Returns the response content consuming the streamed one"""
+        if response.streaming:
+            return b''.join(response.streaming_content)
+        return response.content
+
+    def commit(self):
+        """Returns the current git commit if available"""
+        try:
+            return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
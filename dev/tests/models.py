@@ -13,6 +13,12 @@ class Waypoint(models.Model):
     )
 
     waypoint = models.PointField(geography=True, null=True, blank=True, verbose_name=_("Waypoint"), help_text=_("Waypoint to pass"))
+    job = models.ForeignKey(
+        'DeliveryJob',
+        null=True, blank=True,
+        on_delete=models.SET_NULL,
+        verbose_name=_('Job'),
+    )
 
     def __str__(self):
         return self.name
@@ -1,16 +1,35 @@
 from __future__ import absolute_import, print_function
 
+import asyncio
+import gzip
 import json
+import math
+import os
+import re
+import tempfile
+import time
+from unittest import skipUnless
+from unittest.mock import Mock, patch
 
 from six import text_type
-from tests.admin import WaypointAdmin
+from tests.admin import BuildingAdmin, DeliveryJobAdmin, WaypointAdmin
 from tests.models import Building, DeliveryJob, Waypoint
 
-from django.contrib.auth.models import User
-from django.contrib.gis.geos import Point
-from django.test import Client, TestCase
+from django.contrib import admin
+from django.contrib.auth.models import AnonymousUser, User
+from django.contrib.gis.geos import GeometryCollection, Point, Polygon
+from django.db import connection, transaction
+from django.http import FileResponse
+from django.test import Client, RequestFactory, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
 
 from geoadmin import __version__ as version
+from geoadmin.admin import ASYNC_VIEWS, WRITTEN_SESSION_KEY, GeoAdminMixin
+from geoadmin.cache import get_cache, get_generation
+from geoadmin.encoder import BACKENDS, RawJSON, dumps, get_encoder
+from geoadmin.export import TemporaryFile, available_formats
+from geoadmin.signals import api_timed
+from geoadmin.tiles import lat_to_y, lon_to_x
 
 
 class ModuleTest(TestCase):
@@ -89,6 +108,13 @@ class ModuleTest(TestCase):
                 "north": self.waypoints[0].waypoint.y + 0.0001,
                 "east": self.waypoints[0].waypoint.x + 0.0001,
                 "version": version,
+                "fields": {
+                    "waypoint": {
+                        "name": "waypoint",
+                        "verbose_name": "Waypoint",
+                        "options": WaypointAdmin.geoadmin_feature_options['waypoint']
+                    }
+                }
             },
             "objects": [
                 {
@@ -108,9 +134,7 @@ class ModuleTest(TestCase):
                                     ]
                                 },
                                 "properties": {
-                                    "name": "waypoint",
-                                    "verbose_name": "Waypoint",
-                                    "options": WaypointAdmin.geoadmin_feature_options['waypoint']
+                                    "name": "waypoint"
                                 }
                             }
                         ]
@@ -209,3 +233,768 @@ class ModuleTest(TestCase):
         self.assertEqual(content['meta']['total'], 0)
         self.assertEqual(content['meta']['count'], 0)
         self.assertEqual(len(content['objects']), content['meta']['count'])
+
+    def test_011_geoadmin_api_db_geojson(self):
+        """Test whether the geoadmin api generates the same content using database-side GeoJSON"""
+        c = Client()
+        c.login(username='user', password='password')
+        data = {
+            'south': self.delivery_jobs[6].pickup_point.y - 0.015,
+            'west': self.delivery_jobs[6].pickup_point.x - 0.015,
+            'north': self.delivery_jobs[6].pickup_point.y + 0.015,
+            'east': self.delivery_jobs[6].pickup_point.x + 0.015,
+        }
+        expected = json.loads(c.get('/admin/tests/deliveryjob/geoadmin_api', data=data).content)
+        with patch.object(DeliveryJobAdmin, 'geoadmin_db_geojson', True):
+            response = c.get('/admin/tests/deliveryjob/geoadmin_api', data=data)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['content-type'], 'application/json')
+        content = json.loads(response.content)
+        self.assertEqual(content['meta'], expected['meta'])
+        self.assertEqual(
+            sorted(content['objects'], key=lambda o: o['pk']),
+            sorted(expected['objects'], key=lambda o: o['pk'])
+        )
+
+    def test_012_geoadmin_api_stream(self):
+        """Test whether the geoadmin api streams the same content"""
+        c = Client()
+        c.login(username='user', password='password')
+        data = {
+            'south': self.waypoints[5].waypoint.y - 0.015,
+            'west': self.waypoints[5].waypoint.x - 0.015,
+            'north': self.waypoints[5].waypoint.y + 0.015,
+            'east': self.waypoints[5].waypoint.x + 0.015,
+        }
+        expected = json.loads(c.get('/admin/tests/waypoint/geoadmin_api', data=data).content)
+        with patch.object(WaypointAdmin, 'geoadmin_stream', True):
+            response = c.get('/admin/tests/waypoint/geoadmin_api', data=data)
+            self.assertTrue(response.streaming)
+            content = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['content-type'], 'application/json')
+        self.assertEqual(content['meta'], expected['meta'])
+        self.assertEqual(
+            sorted(content['objects'], key=lambda o: o['pk']),
+            sorted(expected['objects'], key=lambda o: o['pk'])
+        )
+
+        def geoadmin_list_objects(model_admin, *args):
+            return [o for o in GeoAdminMixin.geoadmin_list_objects(model_admin, *args) if o.pk != self.waypoints[5].pk]
+
+        with patch.multiple(WaypointAdmin, geoadmin_stream=True, geoadmin_list_objects=geoadmin_list_objects):
+            content = json.loads(b''.join(c.get('/admin/tests/waypoint/geoadmin_api', data=data).streaming_content))
+        self.assertEqual(len(content['objects']), len(expected['objects']) - 1)
+        self.assertNotIn(self.waypoints[5].pk, [o['pk'] for o in content['objects']])
+
+    def test_013_geoadmin_api_cluster(self):
+        """Test whether the geoadmin api returns clusters instead of objects for the big area"""
+        c = Client()
+        c.login(username='user', password='password')
+        with patch.object(WaypointAdmin, 'geoadmin_cluster', True):
+            response = c.get('/admin/tests/waypoint/geoadmin_api?south=40&north=60&west=45&east=55')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['content-type'], 'application/json')
+        content = json.loads(response.content)
+        self.assertTrue(content['meta']['clustered'])
+        self.assertNotIn('warning', content['meta'])
+        self.assertEqual(content['meta']['south'], 40)
+        self.assertEqual(content['meta']['north'], 60)
+        self.assertEqual(content['objects'], [])
+        self.assertEqual(content['meta']['count'], 9)
+        self.assertEqual(sum(cluster['count'] for cluster in content['clusters']), 9)
+        for cluster in content['clusters']:
+            self.assertEqual(cluster['field'], 'waypoint')
+            west, south, east, north = cluster['bbox']
+            self.assertLessEqual(west, cluster['centroid'][0])
+            self.assertLessEqual(cluster['centroid'][0], east)
+            self.assertLessEqual(south, cluster['centroid'][1])
+            self.assertLessEqual(cluster['centroid'][1], north)
+
+        with patch.object(DeliveryJobAdmin, 'geoadmin_cluster', True):
+            content = json.loads(c.get('/admin/tests/deliveryjob/geoadmin_api?south=40&north=60&west=45&east=55').content)
+        self.assertTrue(content['meta']['clustered'])
+        self.assertEqual(content['meta']['count'], 9)
+        self.assertEqual(sum(cluster['count'] for cluster in content['clusters']), 18)
+        self.assertEqual({cluster['field'] for cluster in content['clusters']}, {'pickup_point', 'dropoff_point'})
+
+    def test_014_geoadmin_api_cluster_threshold(self):
+        """Test whether the geoadmin api returns clusters when the number of objects exceeds the threshold"""
+        c = Client()
+        c.login(username='user', password='password')
+        data = {
+            'south': self.waypoints[5].waypoint.y - 0.015,
+            'west': self.waypoints[5].waypoint.x - 0.015,
+            'north': self.waypoints[5].waypoint.y + 0.015,
+            'east': self.waypoints[5].waypoint.x + 0.015,
+        }
+        with patch.object(WaypointAdmin, 'geoadmin_cluster', True):
+            content = json.loads(c.get('/admin/tests/waypoint/geoadmin_api', data=data).content)
+            self.assertNotIn('clustered', content['meta'])
+            self.assertEqual(content['meta']['count'], 3)
+            with patch.object(WaypointAdmin, 'geoadmin_cluster_threshold', 2):
+                content = json.loads(c.get('/admin/tests/waypoint/geoadmin_api', data=data).content)
+        self.assertTrue(content['meta']['clustered'])
+        self.assertEqual(content['meta']['count'], 3)
+
+    def test_015_geoadmin_tile(self):
+        """Test whether the geoadmin vector tile is generated natively and by the python encoder"""
+        c = Client()
+        c.login(username='user', password='password')
+        wp = self.waypoints[0]
+        z = 14
+        x, y = int(lon_to_x(wp.waypoint.x, z)), int(lat_to_y(wp.waypoint.y, z))
+        response = c.get('/admin/tests/waypoint/geoadmin_tiles/%s/%s/%s.mvt' % (z, x, y))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['content-type'], 'application/vnd.mapbox-vector-tile')
+        self.assertIn('max-age', response['cache-control'])
+        self.assertIn(b'waypoint', response.content)
+        with patch.object(WaypointAdmin, 'geoadmin_tile_native', lambda *args: False):
+            response = c.get('/admin/tests/waypoint/geoadmin_tiles/%s/%s/%s.mvt' % (z, x, y))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'waypoint', response.content)
+        response = c.get('/admin/tests/waypoint/geoadmin_tiles/%s/%s/%s.mvt' % (z, x + 10, y))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b'')
+        response = c.get('/admin/tests/waypoint/geoadmin_tiles/%s/%s/%s.mvt' % (z - 10, x >> 10, y >> 10))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b'')
+        response = c.get('/admin/tests/waypoint/geoadmin_tiles/1/5/0.mvt')
+        self.assertEqual(response.status_code, 404)
+
+    def test_016_geoadmin_api_cache(self):
+        """Test whether the geoadmin api caches objects per tile and invalidates them on modification"""
+        c = Client()
+        c.login(username='user', password='password')
+        data = {
+            'south': self.waypoints[5].waypoint.y - 0.015,
+            'west': self.waypoints[5].waypoint.x - 0.015,
+            'north': self.waypoints[5].waypoint.y + 0.015,
+            'east': self.waypoints[5].waypoint.x + 0.015,
+        }
+        model_admin = admin.site._registry[Waypoint]
+        stats = model_admin.geoadmin_cache_stats()
+        with patch.object(WaypointAdmin, 'geoadmin_cache', True):
+            content = json.loads(c.get('/admin/tests/waypoint/geoadmin_api', data=data).content)
+            self.assertEqual(content['meta']['cache']['hits'], 0)
+            self.assertGreater(content['meta']['cache']['misses'], 0)
+            self.assertTrue(set(w.pk for w in self.waypoints[4:7]) <= set(p['pk'] for p in content['objects']))
+            self.assertEqual(content['meta']['count'], len(content['objects']))
+            cached = json.loads(c.get('/admin/tests/waypoint/geoadmin_api', data=data).content)
+            self.assertEqual(cached['meta']['cache']['misses'], 0)
+            self.assertEqual(cached['meta']['cache']['hits'], content['meta']['cache']['misses'])
+            self.assertEqual(cached['objects'], content['objects'])
+            self.waypoints[5].name = 'Renamed'
+            self.waypoints[5].save()
+            changed = json.loads(c.get('/admin/tests/waypoint/geoadmin_api', data=data).content)
+            self.assertEqual(changed['meta']['cache']['hits'], 0)
+            self.assertIn('Renamed', [p['title'] for p in changed['objects']])
+        self.assertEqual(
+            model_admin.geoadmin_cache_stats()['hits'] - stats['hits'],
+            cached['meta']['cache']['hits']
+        )
+
+    def test_017_geoadmin_api_total_strategy(self):
+        """Test whether the geoadmin api calculates the total number using configured strategy"""
+        c = Client()
+        c.login(username='user', password='password')
+        for strategy in ('exact', 'cached', 'estimated'):
+            with patch.object(WaypointAdmin, 'geoadmin_total', strategy):
+                content = json.loads(c.get('/admin/tests/waypoint/geoadmin_api').content)
+            self.assertIsInstance(content['meta']['total'], int)
+            if strategy != 'estimated':
+                self.assertEqual(content['meta']['total'], 9)
+        with patch.object(WaypointAdmin, 'geoadmin_total', 'cached'):
+            Waypoint.objects.create(name='Waypoint Test New', waypoint=self.waypoints[0].waypoint)
+            content = json.loads(c.get('/admin/tests/waypoint/geoadmin_api').content)
+        self.assertEqual(content['meta']['total'], 10)
+        with patch.object(WaypointAdmin, 'geoadmin_total', 'none'):
+            content = json.loads(c.get('/admin/tests/waypoint/geoadmin_api').content)
+        self.assertNotIn('total', content['meta'])
+
+    def test_018_geoadmin_api_column_pruning(self):
+        """Test whether the geoadmin api loads only necessary columns"""
+        c = Client()
+        c.login(username='user', password='password')
+        data = {
+            'south': self.delivery_jobs[6].pickup_point.y - 0.015,
+            'west': self.delivery_jobs[6].pickup_point.x - 0.015,
+            'north': self.delivery_jobs[6].pickup_point.y + 0.015,
+            'east': self.delivery_jobs[6].pickup_point.x + 0.015,
+        }
+        expected = json.loads(c.get('/admin/tests/deliveryjob/geoadmin_api', data=data).content)
+        expected['objects'].sort(key=lambda o: o['pk'])
+        for options in ({'geoadmin_title_fields': ['name']}, {'geoadmin_only_fields': ['name']}):
+            with patch.multiple(DeliveryJobAdmin, **options), CaptureQueriesContext(connection) as queries:
+                content = json.loads(c.get('/admin/tests/deliveryjob/geoadmin_api', data=data).content)
+            content['objects'].sort(key=lambda o: o['pk'])
+            self.assertEqual(content, expected)
+            selects = [q['sql'] for q in queries if 'intersects' in q['sql'].lower()]
+            self.assertTrue(selects)
+            for sql in selects:
+                self.assertIn('"name"', sql)
+                self.assertNotIn('"price"', sql)
+                self.assertNotIn('"quantity"', sql)
+        with patch.multiple(
+            DeliveryJobAdmin, geoadmin_title_fields=['name'], geoadmin_only_fields=['kind'],
+            geoadmin_values_allowed=lambda *args: False,
+        ), CaptureQueriesContext(connection) as queries:
+            content = json.loads(c.get('/admin/tests/deliveryjob/geoadmin_api', data=data).content)
+        content['objects'].sort(key=lambda o: o['pk'])
+        self.assertEqual(content, expected)
+        self.assertFalse([q for q in queries if '"tests_deliveryjob"."id" = ' in q['sql']])
+
+    def test_019_geoadmin_api_bbox_filter(self):
+        """Test whether the geoadmin api bbox filter modes return the same objects"""
+        c = Client()
+        c.login(username='user', password='password')
+        data = {
+            'south': self.delivery_jobs[6].pickup_point.y - 0.015,
+            'west': self.delivery_jobs[6].pickup_point.x - 0.015,
+            'north': self.delivery_jobs[6].pickup_point.y + 0.015,
+            'east': self.delivery_jobs[6].pickup_point.x + 0.015,
+        }
+        expected = set([w.pk for w in self.delivery_jobs[1:4] + self.delivery_jobs[5:8]])
+        for mode in ('intersects', 'bbox', 'bbox_exact'):
+            for union in (False, True):
+                with patch.multiple(DeliveryJobAdmin, geoadmin_bbox_filter=mode, geoadmin_bbox_union=union):
+                    content = json.loads(c.get('/admin/tests/deliveryjob/geoadmin_api', data=data).content)
+                self.assertEqual(set([p['pk'] for p in content['objects']]), expected)
+
+    def test_020_geoadmin_bbox_filter_uses_index(self):
+        """Test whether the geoadmin bbox filter uses the spatial index"""
+        model_admin = admin.site._registry[DeliveryJob]
+        for mode in ('bbox', 'bbox_exact'):
+            for union in (False, True):
+                with patch.multiple(DeliveryJobAdmin, geoadmin_bbox_filter=mode, geoadmin_bbox_union=union):
+                    queryset = model_admin.geoadmin_bbox_filter_queryset(
+                        None, DeliveryJob.objects.all(), ['pickup_point', 'dropoff_point'], 50, 50, 50.1, 50.1
+                    )
+                sql, params = queryset.query.sql_with_params()
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+                    cursor.execute('EXPLAIN %s' % sql, params)
+                    plan = '\n'.join(row[0] for row in cursor.fetchall())
+                    cursor.execute('SET LOCAL enable_seqscan = on')
+                self.assertIn('Index Scan on tests_deliveryjob_pickup_point_id', plan)
+                self.assertIn('Index Scan on tests_deliveryjob_dropoff_point_id', plan)
+
+    def test_021_geoadmin_api_simplify(self):
+        """Test whether the geoadmin api simplifies geometries according to the zoom level"""
+        c = Client()
+        c.login(username='user', password='password')
+        ring = [
+            (50.05 + 0.01 * math.cos(i * math.pi / 100), 50.05 + 0.01 * math.sin(i * math.pi / 100))
+            for i in range(200)
+        ]
+        Building.objects.create(name='Round', geometry=GeometryCollection(Polygon(ring + ring[:1]), srid=4326))
+        data = {'south': 50.02, 'west': 50.02, 'north': 50.08, 'east': 50.08}
+        options = {
+            'geometry': {
+                **BuildingAdmin.geoadmin_feature_options['geometry'],
+                'simplify': {'tolerance': 1.0},
+            },
+        }
+
+        def coordinates(content):
+            geometry = content['objects'][0]['geo']['features'][0]['geometry']
+            return geometry['geometries'][0]['coordinates'][0]
+
+        content = json.loads(c.get('/admin/tests/building/geoadmin_api', data=data).content)
+        self.assertEqual(len(coordinates(content)), 201)
+        for db_geojson in (False, True):
+            with patch.multiple(BuildingAdmin, geoadmin_feature_options=options, geoadmin_db_geojson=db_geojson):
+                content = json.loads(c.get('/admin/tests/building/geoadmin_api', data=data).content)
+                self.assertEqual(len(coordinates(content)), 201)
+                content = json.loads(c.get('/admin/tests/building/geoadmin_api', data={**data, 'zoom': 10}).content)
+                self.assertLess(len(coordinates(content)), 50)
+                self.assertGreaterEqual(len(coordinates(content)), 4)
+
+    def test_022_geoadmin_api_per_object_feature_options(self):
+        """Test whether the geoadmin api passes per-object feature options when they are overriden"""
+        c = Client()
+        c.login(username='user', password='password')
+        data = {
+            'south': self.waypoints[0].waypoint.y - 0.0001,
+            'west': self.waypoints[0].waypoint.x - 0.0001,
+            'north': self.waypoints[0].waypoint.y + 0.0001,
+            'east': self.waypoints[0].waypoint.x + 0.0001,
+        }
+
+        def geoadmin_geojson_feature_options(self, request, o, field_name):
+            return {'style': {'color': 'blue' if o.pk % 2 else 'green'}}
+
+        with patch.object(WaypointAdmin, 'geoadmin_geojson_feature_options', geoadmin_geojson_feature_options):
+            content = json.loads(c.get('/admin/tests/waypoint/geoadmin_api', data=data).content)
+        self.assertEqual(content['objects'][0]['geo']['features'][0]['properties'], {
+            'name': 'waypoint',
+            'verbose_name': 'Waypoint',
+            'options': {'style': {'color': 'blue' if self.waypoints[0].pk % 2 else 'green'}},
+        })
+        self.assertEqual(content['objects'][0]['url'], '/admin/tests/waypoint/%s/change/' % self.waypoints[0].pk)
+
+    def test_023_geoadmin_api_delta(self):
+        """Test whether the geoadmin api returns only objects not known by the map"""
+        c = Client()
+        c.login(username='user', password='password')
+        data = {
+            'south': self.waypoints[5].waypoint.y - 0.015,
+            'west': self.waypoints[5].waypoint.x - 0.015,
+            'north': self.waypoints[5].waypoint.y + 0.015,
+            'east': self.waypoints[5].waypoint.x + 0.015,
+        }
+        with patch.object(WaypointAdmin, 'geoadmin_delta', True):
+            content = json.loads(c.get('/admin/tests/waypoint/geoadmin_api', data=data).content)
+            self.assertNotIn('delta', content['meta'])
+            pks = [str(p['pk']) for p in content['objects']]
+            self.assertEqual(len(pks), 3)
+            known = pks[:2] + ['0']
+            delta = json.loads(c.get('/admin/tests/waypoint/geoadmin_api', data={
+                **data, 'known': ','.join(known), 'since': content['meta']['generation'],
+            }).content)
+            self.assertTrue(delta['meta']['delta'])
+            self.assertEqual(delta['meta']['count'], 3)
+            self.assertEqual(delta['meta']['removed'], ['0'])
+            self.assertEqual([str(p['pk']) for p in delta['objects']], pks[2:])
+            self.waypoints[5].name = 'Renamed'
+            self.waypoints[5].save()
+            changed = json.loads(c.get('/admin/tests/waypoint/geoadmin_api', data={
+                **data, 'known': ','.join(known), 'since': content['meta']['generation'],
+            }).content)
+            self.assertNotEqual(changed['meta']['generation'], content['meta']['generation'])
+            self.assertEqual(sorted(str(p['pk']) for p in changed['objects']), sorted(pks))
+            with patch.object(WaypointAdmin, 'geoadmin_delta_max_known', 1):
+                full = json.loads(c.get('/admin/tests/waypoint/geoadmin_api', data={
+                    **data, 'known': ','.join(known), 'since': changed['meta']['generation'],
+                }).content)
+            self.assertNotIn('delta', full['meta'])
+            self.assertEqual(len(full['objects']), 3)
+
+    def test_024_geoadmin_client_options(self):
+        """Test whether the geoadmin page passes client options to the map"""
+        c = Client()
+        c.login(username='user', password='password')
+        with patch.multiple(WaypointAdmin, geoadmin_client_fetch_delay=250, geoadmin_client_persistent_cache=True):
+            response = c.get('/admin/tests/waypoint/geoadmin')
+        self.assertIn('"fetchDelay": 250', text_type(response.content))
+        self.assertIn('"persistentCache": true', text_type(response.content))
+        self.assertIn('"cacheSize": 16', text_type(response.content))
+        self.assertIn('maxKnown: 300,', text_type(response.content))
+        self.assertIn('maxKnownLength: 2000,', text_type(response.content))
+
+    def test_025_geoadmin_api_columnar(self):
+        """Test whether the geoadmin api returns objects in the columnar format"""
+        c = Client()
+        c.login(username='user', password='password')
+        data = {
+            'south': self.waypoints[5].waypoint.y - 0.015,
+            'west': self.waypoints[5].waypoint.x - 0.015,
+            'north': self.waypoints[5].waypoint.y + 0.015,
+            'east': self.waypoints[5].waypoint.x + 0.015,
+        }
+        content = json.loads(c.get('/admin/tests/waypoint/geoadmin_api', data=data).content)
+        response = c.get('/admin/tests/waypoint/geoadmin_api', data=data, HTTP_ACCEPT='application/vnd.geoadmin.columnar+json')
+        self.assertIn('Accept', response['Vary'])
+        columnar = json.loads(response.content)
+        self.assertEqual(columnar, json.loads(c.get('/admin/tests/waypoint/geoadmin_api', data={**data, 'format': 'columnar'}).content))
+        self.assertEqual(columnar['meta']['format'], 'columnar')
+        self.assertEqual(columnar['meta']['url_template'], '/admin/tests/waypoint/{pk}/change/')
+        self.assertEqual(set(columnar['objects']), {'pk', 'title', 'fields'})
+        self.assertEqual(columnar['objects']['pk'], [o['pk'] for o in content['objects']])
+        self.assertEqual(columnar['objects']['title'], [o['title'] for o in content['objects']])
+        self.assertEqual(columnar['objects']['fields'], {
+            'waypoint': {
+                'x': [o['geo']['features'][0]['geometry']['coordinates'][0] for o in content['objects']],
+                'y': [o['geo']['features'][0]['geometry']['coordinates'][1] for o in content['objects']],
+            }
+        })
+        self.assertLess(len(json.dumps(columnar['objects'])), len(json.dumps(content['objects'])) / 3)
+        with patch.object(WaypointAdmin, 'geoadmin_db_geojson', True):
+            self.assertEqual(
+                json.loads(c.get('/admin/tests/waypoint/geoadmin_api', data={**data, 'format': 'columnar'}).content)['objects'],
+                columnar['objects']
+            )
+        Building.objects.create(name='Columnar', geometry=GeometryCollection(Point(51, 51), srid=4326))
+        buildings = json.loads(c.get('/admin/tests/building/geoadmin_api', data={
+            'south': 50.99, 'west': 50.99, 'north': 51.01, 'east': 51.01, 'format': 'columnar',
+        }).content)
+        self.assertEqual(buildings['objects']['fields']['geometry']['geometry'], [
+            {'type': 'GeometryCollection', 'geometries': [{'type': 'Point', 'coordinates': [51.0, 51.0]}]}
+        ])
+
+    def test_026_geoadmin_api_conditional(self):
+        """Test whether the geoadmin api returns 304 for the unchanged data"""
+        c = Client()
+        c.login(username='user', password='password')
+        data = {
+            'south': self.waypoints[5].waypoint.y - 0.015,
+            'west': self.waypoints[5].waypoint.x - 0.015,
+            'north': self.waypoints[5].waypoint.y + 0.015,
+            'east': self.waypoints[5].waypoint.x + 0.015,
+        }
+        response = c.get('/admin/tests/waypoint/geoadmin_api', data=data)
+        self.assertNotIn('ETag', response)
+        self.assertIn('no-cache', response['Cache-Control'])
+        with patch.multiple(WaypointAdmin, geoadmin_conditional=True, geoadmin_conditional_max_age=5):
+            response = c.get('/admin/tests/waypoint/geoadmin_api', data=data)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('max-age=5', response['Cache-Control'])
+            self.assertIn('private', response['Cache-Control'])
+            etag = response['ETag']
+            with CaptureQueriesContext(connection) as queries:
+                response = c.get('/admin/tests/waypoint/geoadmin_api', data=data, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response['ETag'], etag)
+            self.assertFalse([q for q in queries.captured_queries if 'tests_waypoint' in q['sql']])
+            response = c.get('/admin/tests/waypoint/geoadmin_api', data={**data, 'zoom': 10}, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.waypoints[5].save()
+            response = c.get('/admin/tests/waypoint/geoadmin_api', data=data, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response['ETag'], etag)
+
+    def test_027_geoadmin_api_compression(self):
+        """Test whether the geoadmin api compresses the response"""
+        c = Client()
+        c.login(username='user', password='password')
+        data = {
+            'south': self.waypoints[5].waypoint.y - 0.015,
+            'west': self.waypoints[5].waypoint.x - 0.015,
+            'north': self.waypoints[5].waypoint.y + 0.015,
+            'east': self.waypoints[5].waypoint.x + 0.015,
+        }
+        content = c.get('/admin/tests/waypoint/geoadmin_api', data=data).content
+        with patch.multiple(WaypointAdmin, geoadmin_compression=True, geoadmin_compression_min_size=100):
+            response = c.get('/admin/tests/waypoint/geoadmin_api', data=data, HTTP_ACCEPT_ENCODING='gzip')
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+            self.assertIn('Accept-Encoding', response['Vary'])
+            self.assertEqual(gzip.decompress(response.content), content)
+            response = c.get('/admin/tests/waypoint/geoadmin_api', data=data, HTTP_ACCEPT_ENCODING='identity')
+            self.assertFalse(response.has_header('Content-Encoding'))
+            self.assertEqual(response.content, content)
+            with patch.object(WaypointAdmin, 'geoadmin_compression_min_size', len(content) + 1):
+                response = c.get('/admin/tests/waypoint/geoadmin_api', data=data, HTTP_ACCEPT_ENCODING='gzip')
+            self.assertFalse(response.has_header('Content-Encoding'))
+            with patch.object(WaypointAdmin, 'geoadmin_stream', True):
+                response = c.get('/admin/tests/waypoint/geoadmin_api', data=data, HTTP_ACCEPT_ENCODING='gzip')
+                self.assertEqual(response['Content-Encoding'], 'gzip')
+                streamed = json.loads(gzip.decompress(b''.join(response.streaming_content)).decode('utf-8'))
+            self.assertEqual(streamed['objects'], json.loads(content)['objects'])
+
+    def test_028_geoadmin_initial_extent(self):
+        """Test whether the geoadmin initial extent is calculated on the database side and cached"""
+        get_cache().clear()
+        c = Client()
+        c.login(username='user', password='password')
+        model_admin = admin.site._registry[Waypoint]
+        self.assertEqual(model_admin.geoadmin_initial(None, Waypoint.objects.none(), []), (0, 0))
+        with CaptureQueriesContext(connection) as queries:
+            response = c.get('/admin/tests/waypoint/geoadmin')
+        self.assertEqual(len([q for q in queries.captured_queries if 'ST_Extent' in q['sql']]), 1)
+        extent = json.loads(re.search(r'var initialExtent = (.*);', response.content.decode('utf-8')).group(1))
+        for actual, expected in zip(sum(extent, []), [50.51, 50.01, 50.59, 50.09]):
+            self.assertAlmostEqual(actual, expected)
+        with CaptureQueriesContext(connection) as queries:
+            content = json.loads(c.get('/admin/tests/waypoint/geoadmin_api').content)
+        self.assertFalse([q for q in queries.captured_queries if 'ST_Extent' in q['sql']])
+        self.assertAlmostEqual(content['meta']['south'], 50.54)
+        self.assertAlmostEqual(content['meta']['west'], 50.04)
+        self.assertIn(self.waypoints[4].pk, [o['pk'] for o in content['objects']])
+        Waypoint.objects.create(name='Waypoint Test Far', waypoint=Point([51, 51]))
+        response = c.get('/admin/tests/waypoint/geoadmin')
+        extent = json.loads(re.search(r'var initialExtent = (.*);', response.content.decode('utf-8')).group(1))
+        for actual, expected in zip(sum(extent, []), [50.51, 50.01, 51, 51]):
+            self.assertAlmostEqual(actual, expected)
+
+    def test_029_geoadmin_api_related_queries(self):
+        """Test whether the geoadmin api issues a constant number of queries for objects referring related ones"""
+        for waypoint, job in zip(self.waypoints, self.delivery_jobs):
+            waypoint.job = job
+            waypoint.save()
+        c = Client()
+        c.login(username='user', password='password')
+
+        def get(size):
+            response = c.get('/admin/tests/waypoint/geoadmin_api', data={
+                'south': self.waypoints[4].waypoint.y - size,
+                'west': self.waypoints[4].waypoint.x - size,
+                'north': self.waypoints[4].waypoint.y + size,
+                'east': self.waypoints[4].waypoint.x + size,
+            })
+            return json.loads(b''.join(response.streaming_content) if response.streaming else response.content)
+
+        def queries(size):
+            with CaptureQueriesContext(connection) as captured:
+                content = get(size)
+            return len(captured.captured_queries), content['meta']['count']
+
+        with patch.object(Waypoint, '__str__', lambda o: '%s (%s)' % (o.name, o.job)):
+            small, large = queries(0.015), queries(0.045)
+            self.assertEqual((small[1], large[1]), (3, 9))
+            self.assertEqual(large[0] - small[0], 6)
+            for stream in (False, True):
+                for options in (
+                    {'list_select_related': ['job']},
+                    {'geoadmin_select_related': ['job'], 'geoadmin_only_fields': ['name']},
+                    {'geoadmin_prefetch_related': ['job']},
+                ):
+                    with patch.multiple(WaypointAdmin, geoadmin_stream=stream, **options):
+                        small, large = queries(0.015), queries(0.045)
+                        self.assertEqual(small[0], large[0])
+                        self.assertEqual(get(0.005)['objects'][0]['title'], 'Waypoint Test 5 (Delivery Test 5)')
+
+    def test_030_geoadmin_detail_api(self):
+        """Test whether the geoadmin detail api returns details of the object loaded lazily"""
+        c = Client()
+        c.login(username='user', password='password')
+        waypoint = self.waypoints[4]
+        response = c.get('/admin/tests/waypoint/geoadmin_api/%s' % waypoint.pk)
+        self.assertEqual(response.status_code, 200)
+        content = json.loads(response.content)
+        self.assertEqual(content['pk'], waypoint.pk)
+        self.assertEqual(content['title'], 'Waypoint Test 5')
+        self.assertEqual(content['url'], '/admin/tests/waypoint/%s/change/' % waypoint.pk)
+        self.assertIn('href="/admin/tests/waypoint/%s/change/"' % waypoint.pk, content['popup'])
+        self.assertEqual(c.get('/admin/tests/waypoint/geoadmin_api/0').status_code, 404)
+        staff = User.objects.create(username='staff', is_staff=True)
+        staff.set_password('password')
+        staff.save()
+        other = Client()
+        other.login(username='staff', password='password')
+        self.assertEqual(other.get('/admin/tests/waypoint/geoadmin_api/%s' % waypoint.pk).status_code, 403)
+        data = {
+            'south': waypoint.waypoint.y - 0.015,
+            'west': waypoint.waypoint.x - 0.015,
+            'north': waypoint.waypoint.y + 0.015,
+            'east': waypoint.waypoint.x + 0.015,
+        }
+        with patch.object(WaypointAdmin, 'geoadmin_lazy_details', True):
+            content = json.loads(c.get('/admin/tests/waypoint/geoadmin_api', data=data).content)
+            self.assertEqual(set(content['objects'][0]), {'pk', 'geo'})
+            self.assertEqual(len(content['objects']), 3)
+            columnar = json.loads(c.get('/admin/tests/waypoint/geoadmin_api', data={**data, 'format': 'columnar'}).content)
+            self.assertEqual(set(columnar['objects']), {'pk', 'fields'})
+
+    @skipUnless(ASYNC_VIEWS, 'async views require Django 3.1')
+    def test_031_geoadmin_async_view(self):
+        """Test whether the geoadmin api is routed to the async view checking permissions"""
+        model_admin = admin.site._registry[Waypoint]
+        with patch.object(WaypointAdmin, 'geoadmin_async', True):
+            urls = model_admin.get_urls()
+        view = [u for u in urls if u.name == 'tests_waypoint_geoadmin_api'][0].callback
+        self.assertTrue(asyncio.iscoroutinefunction(view))
+        request = RequestFactory().get('/admin/tests/waypoint/geoadmin_api')
+        request.user = AnonymousUser()
+        loop = asyncio.new_event_loop()
+        try:
+            response = loop.run_until_complete(view(request))
+        finally:
+            loop.close()
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(asyncio.iscoroutinefunction(
+            [u for u in model_admin.get_urls() if u.name == 'tests_waypoint_geoadmin_api'][0].callback
+        ))
+
+    def test_032_geoadmin_api_timing(self):
+        """Test whether the geoadmin api reports durations of processing phases"""
+        c = Client()
+        c.login(username='user', password='password')
+        data = {
+            'south': self.waypoints[5].waypoint.y - 0.015,
+            'west': self.waypoints[5].waypoint.x - 0.015,
+            'north': self.waypoints[5].waypoint.y + 0.015,
+            'east': self.waypoints[5].waypoint.x + 0.015,
+        }
+        response = c.get('/admin/tests/waypoint/geoadmin_api', data=data)
+        self.assertNotIn('Server-Timing', response)
+        self.assertNotIn('timings', json.loads(response.content)['meta'])
+        reported = []
+
+        def receiver(sender, model_admin, request, timings, **kwargs):
+            reported.append((sender, timings))
+
+        hook = Mock()
+        api_timed.connect(receiver)
+        try:
+            with patch.multiple(WaypointAdmin, geoadmin_timing=True, geoadmin_timing_hooks=[hook]):
+                response = c.get('/admin/tests/waypoint/geoadmin_api', data=data)
+        finally:
+            api_timed.disconnect(receiver)
+        metrics = [m.split(';')[0] for m in response['Server-Timing'].split(', ')]
+        for name in ('params', 'count', 'fetch', 'serialize', 'encode', 'db', 'total'):
+            self.assertIn(name, metrics)
+        timings = json.loads(response.content)['meta']['timings']
+        self.assertIn('fetch', timings)
+        self.assertGreater(timings['queries'], 0)
+        self.assertEqual(len(reported), 1)
+        self.assertIs(reported[0][0], WaypointAdmin)
+        self.assertEqual(reported[0][1]['bytes'], len(response.content))
+        hook.assert_called_once()
+        self.assertEqual(hook.call_args[0][2], reported[0][1])
+        with patch.multiple(WaypointAdmin, geoadmin_timing=True, geoadmin_timing_header=False, geoadmin_timing_meta=False):
+            response = c.get('/admin/tests/waypoint/geoadmin_api', data=data)
+            self.assertNotIn('Server-Timing', response)
+            self.assertNotIn('timings', json.loads(response.content)['meta'])
+        with patch.multiple(WaypointAdmin, geoadmin_timing=True, geoadmin_stream=True):
+            response = c.get('/admin/tests/waypoint/geoadmin_api', data=data)
+            self.assertNotIn('Server-Timing', response)
+            self.assertEqual(len(json.loads(b''.join(response.streaming_content))['objects']), 3)
+
+    def test_033_geoadmin_api_encoder(self):
+        """Test whether the geoadmin api encodes the response by the configured backend"""
+        value = {'a': [1, 1.5, None, True, 'xé'], 'b': RawJSON('{"type":"Point"}'), 'c': '\x000:0'}
+        self.assertEqual(dumps(value), '{"a": [1, 1.5, null, true, "x\\u00e9"], "b": {"type":"Point"}, "c": "\\u00000:0"}')
+        for backend in ['auto'] + list(BACKENDS):
+            self.assertEqual(json.loads(get_encoder(backend)(value)), {**value, 'b': {'type': 'Point'}})
+        with self.assertRaises(ValueError):
+            get_encoder('unknown')
+        c = Client()
+        c.login(username='user', password='password')
+        data = {
+            'south': self.waypoints[5].waypoint.y - 0.015,
+            'west': self.waypoints[5].waypoint.x - 0.015,
+            'north': self.waypoints[5].waypoint.y + 0.015,
+            'east': self.waypoints[5].waypoint.x + 0.015,
+        }
+        for db_geojson in (False, True):
+            with patch.object(WaypointAdmin, 'geoadmin_db_geojson', db_geojson):
+                expected = c.get('/admin/tests/waypoint/geoadmin_api', data=data).content
+                with patch.object(WaypointAdmin, 'geoadmin_encoder', 'auto'):
+                    content = c.get('/admin/tests/waypoint/geoadmin_api', data=data).content
+            self.assertEqual(json.loads(content), json.loads(expected))
+            if not db_geojson:
+                self.assertEqual(expected, json.dumps(json.loads(expected)).encode('utf-8'))
+
+    def test_034_geoadmin_export(self):
+        """Test whether the geoadmin export streams objects of the window or selected by the action"""
+        c = Client()
+        c.login(username='user', password='password')
+        response = c.get('/admin/tests/deliveryjob/geoadmin_export')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/geo+json-seq')
+        self.assertIn('deliveryjob.ndjson', response['Content-Disposition'])
+        features = [json.loads(line) for line in b''.join(response.streaming_content).decode('utf-8').splitlines()]
+        self.assertEqual(len(features), 18)
+        self.assertEqual(
+            {(f['id'], f['properties']['name']) for f in features},
+            {(j.pk, name) for j in self.delivery_jobs for name in ('pickup_point', 'dropoff_point')}
+        )
+        self.assertEqual(features[0]['properties']['title'], str(DeliveryJob.objects.get(pk=features[0]['id'])))
+        for f in features:
+            name = f['properties']['name']
+            self.assertEqual(f['properties']['verbose_name'], str(DeliveryJob._meta.get_field(name).verbose_name))
+            self.assertEqual(f['properties']['options'], DeliveryJobAdmin.geoadmin_feature_options[name])
+        data = {
+            'south': self.waypoints[5].waypoint.y - 0.015,
+            'west': self.waypoints[5].waypoint.x - 0.015,
+            'north': self.waypoints[5].waypoint.y + 0.015,
+            'east': self.waypoints[5].waypoint.x + 0.015,
+        }
+        for db_geojson in (False, True):
+            with patch.object(WaypointAdmin, 'geoadmin_db_geojson', db_geojson):
+                response = c.get('/admin/tests/waypoint/geoadmin_export', data=data)
+            features = [json.loads(line) for line in b''.join(response.streaming_content).decode('utf-8').splitlines()]
+            self.assertEqual(sorted(f['id'] for f in features), [w.pk for w in self.waypoints[4:7]])
+            self.assertEqual(features[0]['geometry']['type'], 'Point')
+        response = c.get('/admin/tests/waypoint/geoadmin_export', data={'format': 'unknown'})
+        self.assertEqual(response.status_code, 404)
+        staff = User.objects.create(username='staff', is_staff=True)
+        staff.set_password('password')
+        staff.save()
+        other = Client()
+        other.login(username='staff', password='password')
+        self.assertEqual(other.get('/admin/tests/waypoint/geoadmin_export').status_code, 403)
+        response = c.get('/admin/tests/waypoint/geoadmin')
+        self.assertIn('/admin/tests/waypoint/geoadmin_export', text_type(response.content))
+        response = c.post('/admin/tests/waypoint/', {
+            'action': 'geoadmin_export_ndjson',
+            '_selected_action': [w.pk for w in self.waypoints[:2]],
+        })
+        features = [json.loads(line) for line in b''.join(response.streaming_content).decode('utf-8').splitlines()]
+        self.assertEqual(sorted(f['id'] for f in features), [w.pk for w in self.waypoints[:2]])
+        directory = tempfile.mkdtemp()
+        with open(os.path.join(directory, 'export.fgb'), 'wb') as f:
+            f.write(b'fgb')
+        FileResponse(TemporaryFile(os.path.join(directory, 'export.fgb'), directory)).close()
+        self.assertFalse(os.path.exists(directory))
+        for format, signature in (('fgb', b'fgb\x03'), ('gpkg', b'SQLite format 3\x00')):
+            if format not in available_formats():
+                continue
+            response = c.get('/admin/tests/waypoint/geoadmin_export', data={**data, 'format': format})
+            self.assertEqual(b''.join(response.streaming_content)[:len(signature)], signature)
+
+    def test_035_geoadmin_using(self):
+        """Test whether map queries are routed to the configured database unless the user has modified objects"""
+        model_admin = admin.site._registry[Waypoint]
+        request = RequestFactory().get('/admin/tests/waypoint/geoadmin_api')
+        request.user = self.user
+        request.session = {}
+        self.assertEqual(model_admin.geoadmin_queryset(request).db, 'default')
+        with patch.multiple(WaypointAdmin, geoadmin_using='replica', geoadmin_using_sticky=10):
+            self.assertEqual(model_admin.geoadmin_queryset(request).db, 'replica')
+            model_admin.save_model(request, self.waypoints[0], None, True)
+            self.assertEqual(model_admin.geoadmin_queryset(request).db, 'default')
+            request.session[WRITTEN_SESSION_KEY] -= 10
+            self.assertEqual(model_admin.geoadmin_queryset(request).db, 'replica')
+            model_admin.delete_model(request, self.waypoints[0])
+            self.assertEqual(model_admin.geoadmin_queryset(request).db, 'default')
+        with patch.multiple(WaypointAdmin, geoadmin_using='replica', geoadmin_using_sticky=0):
+            model_admin.save_model(request, self.waypoints[1], None, True)
+            self.assertEqual(model_admin.geoadmin_queryset(request).db, 'replica')
+        c = Client()
+        c.login(username='user', password='password')
+        data = {
+            'south': self.waypoints[5].waypoint.y - 0.015,
+            'west': self.waypoints[5].waypoint.x - 0.015,
+            'north': self.waypoints[5].waypoint.y + 0.015,
+            'east': self.waypoints[5].waypoint.x + 0.015,
+        }
+        with patch.multiple(WaypointAdmin, geoadmin_using='default', geoadmin_total='estimated'):
+            content = json.loads(c.get('/admin/tests/waypoint/geoadmin_api', data=data).content)
+            self.assertEqual(len(content['objects']), 3)
+            response = c.get('/admin/tests/waypoint/geoadmin_tiles/%s/%s/%s.mvt' % (
+                14, int(lon_to_x(self.waypoints[5].waypoint.x, 14)), int(lat_to_y(self.waypoints[5].waypoint.y, 14))
+            ))
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.content)
+        with patch.multiple(
+            WaypointAdmin, geoadmin_using='default', geoadmin_using_sticky=10,
+            geoadmin_cache=True, geoadmin_conditional=True, geoadmin_delta=True,
+        ):
+            self.waypoints[5].save()
+            for i in range(2):
+                response = c.get('/admin/tests/waypoint/geoadmin_api', data=data)
+                self.assertNotIn('ETag', response)
+                content = json.loads(response.content)
+                self.assertNotIn('generation', content['meta'])
+                self.assertEqual(content['meta']['cache']['hits'], 0)
+            with patch('geoadmin.admin.time.time', return_value=time.time() + 10):
+                response = c.get('/admin/tests/waypoint/geoadmin_api', data=data)
+            self.assertIn('ETag', response)
+            self.assertIn('generation', json.loads(response.content)['meta'])
+
+
+class TransactionTest(TransactionTestCase):
+
+    def setUp(self):
+        """Sets the test environment"""
+        self.user = User.objects.create(username='user', is_superuser=True, is_staff=True)
+        self.user.set_password('password')
+        self.user.save()
+        self.waypoint = Waypoint.objects.create(name='Waypoint Test', waypoint=Point([50.05, 50.55]))
+
+    def test_036_generation_bumped_on_commit(self):
+        """Test whether responses read before the commit of the modification are not valid after it"""
+        c = Client()
+        c.login(username='user', password='password')
+        data = {'south': 50.5, 'west': 50, 'north': 50.6, 'east': 50.1}
+        with patch.object(WaypointAdmin, 'geoadmin_conditional', True):
+            with transaction.atomic():
+                self.waypoint.name = 'Waypoint Modified'
+                self.waypoint.save()
+                generation = get_generation(Waypoint)
+                # the response of the concurrent request made before the commit
+                etag = c.get('/admin/tests/waypoint/geoadmin_api', data=data)['ETag']
+            self.assertNotEqual(get_generation(Waypoint), generation)
+            response = c.get('/admin/tests/waypoint/geoadmin_api', data=data, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
@@ -1,20 +1,125 @@
+import asyncio
 import json
+import math
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial, update_wrapper
+from types import SimpleNamespace
+from urllib.parse import quote
 
 import geojson
 
+import django
 from django import forms
-from django.contrib.gis.geos import MultiPoint, Polygon
-from django.db.models import Q
-from django.http import HttpResponse
+from django.contrib.admin.options import IS_POPUP_VAR
+from django.contrib.admin.utils import unquote
+from django.contrib.gis.db.models import Extent
+from django.contrib.gis.db.models.functions import (
+    AsGeoJSON,
+    Centroid,
+    SnapToGrid,
+    Transform,
+)
+from django.contrib.gis.geos import Polygon
+from django.core.exceptions import PermissionDenied
+from django.db import close_old_connections, connections
+from django.db.models import Avg, CharField, Count, Q, Value
+from django.db.models.expressions import RawSQL
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpResponse,
+    StreamingHttpResponse,
+)
+from django.template.loader import render_to_string
 from django.template.response import TemplateResponse
 from django.urls import reverse
+from django.utils.cache import (
+    add_never_cache_headers,
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
 from django.utils.html import mark_safe
-from django.utils.translation import ugettext_lazy as _
+from django.utils.http import RFC3986_SUBDELIMS, http_date
+from django.utils.module_loading import import_string
+from django.utils.translation import get_language, ugettext_lazy as _
 
+from .cache import (
+    count_stats,
+    get_cache,
+    get_generation,
+    get_modified,
+    get_stats,
+    make_key,
+    track_generation,
+)
+from .compression import choose_encoding, compress, compress_stream
+from .encoder import RawJSON, get_encoder
+from .export import CONTENT_TYPES, TemporaryFile, available_formats, write_ogr
+from .functions import (
+    AsGeometry,
+    AsMVTGeom,
+    MakeEnvelope,
+    Simplify,
+    SimplifyPreserveTopology,
+    X,
+    Y,
+)
+from .mvt import encode_layer
 from .options import get_option
+from .signals import api_timed
+from .tiles import (
+    tile_bounds,
+    tile_mercator_bounds,
+    tile_valid,
+    tiles_covering,
+    zoom_for_window,
+)
+from .timing import Timings, untimed
 from .version import __version__
 
 
+#: placeholder of the primary key in the URL template
+PK_PLACEHOLDER = '__geoadmin_pk__'
+#: media type of the columnar API response
+COLUMNAR_MEDIA_TYPE = 'application/vnd.geoadmin.columnar+json'
+#: whether the Django version supports async views
+ASYNC_VIEWS = django.VERSION >= (3, 1)
+
+#: session key of the time when the user has modified objects last time
+WRITTEN_SESSION_KEY = '_geoadmin_written'
+
+
+def script_json(value):
+    """Encodes the value to JSON safe to be inserted into the page script"""
+    return mark_safe(json.dumps(value).replace('<', '\\u003c').replace('>', '\\u003e').replace('&', '\\u0026'))
+
+
+def format_url(template, pk):
+    """Substitutes the primary key into the URL template"""
+    return template.replace(PK_PLACEHOLDER, quote(str(pk), safe=RFC3986_SUBDELIMS + '/~:@'))
+
+
+def lookup(o, name):
+    """Returns the attribute of the object, following relations for names like `owner__name`"""
+    if hasattr(o, name):
+        return getattr(o, name)
+    for part in name.split('__'):
+        if o is None:
+            return None
+        o = getattr(o, part)
+    return o
+
+
+def overridden(model_admin, name):
+    """Checks whether the method of the Geo Admin has been overriden"""
+    return getattr(type(model_admin), name) is not getattr(GeoAdminMixin, name)
+
+
 class GeoAdminMixin(object):
     #: overriding list view default template
     change_list_template = 'geoadmin/geoadmin_change_list.html'
@@ -26,25 +131,150 @@ class GeoAdminMixin(object):
     #: geoadmin maximal coordinates diff to avoid overload on high zoom
     geoadmin_max_window_lat_size = get_option('max_window.lat_size')
     geoadmin_max_window_lon_size = get_option('max_window.lon_size')
+    #: geoadmin generates GeoJSON geometries on the database side
+    geoadmin_db_geojson = get_option('db_geojson.enabled')
+    #: geoadmin precision of the coordinates generated on the database side
+    geoadmin_db_geojson_precision = get_option('db_geojson.precision')
+    #: geoadmin streams the API response
+    geoadmin_stream = get_option('stream.enabled')
+    #: geoadmin number of objects fetched from the database at once while streaming
+    geoadmin_stream_chunk_size = get_option('stream.chunk_size')
+    #: geoadmin returns clusters instead of objects for big windows
+    geoadmin_cluster = get_option('cluster.enabled')
+    #: geoadmin maximal number of objects returned without clustering
+    geoadmin_cluster_threshold = get_option('cluster.threshold')
+    #: geoadmin number of cluster grid cells along the biggest window side
+    geoadmin_cluster_grid_size = get_option('cluster.grid_size')
+    #: geoadmin shows objects on the map using vector tiles
+    geoadmin_tiles = get_option('tiles.enabled')
+    #: geoadmin minimal zoom level of the not empty vector tile
+    geoadmin_tiles_min_zoom = get_option('tiles.min_zoom')
+    #: geoadmin vector tile coordinates extent
+    geoadmin_tiles_extent = get_option('tiles.extent')
+    #: geoadmin vector tile geometry clipping buffer in tile coordinates
+    geoadmin_tiles_buffer = get_option('tiles.buffer')
+    #: geoadmin vector tile browser cache lifetime in seconds
+    geoadmin_tiles_max_age = get_option('tiles.max_age')
+    #: geoadmin caches API objects per tile
+    geoadmin_cache = get_option('cache.enabled')
+    #: geoadmin cached tile lifetime in seconds
+    geoadmin_cache_timeout = get_option('cache.timeout')
+    #: geoadmin maximal number of cached tiles covering the window
+    geoadmin_cache_max_tiles = get_option('cache.max_tiles')
+    #: geoadmin strategy of the total objects number calculation: exact, cached, estimated, none
+    geoadmin_total = get_option('total.strategy')
+    #: geoadmin cached total objects number lifetime in seconds
+    geoadmin_total_timeout = get_option('total.timeout')
+    #: geoadmin additional fields loaded from the database, all fields are loaded if None
+    geoadmin_only_fields = None
+    #: geoadmin fields making the object title, the title is made by the `str` if None
+    geoadmin_title_fields = None
+    #: related objects fetched together with objects, the `list_select_related` is used if `None`
+    geoadmin_select_related = None
+    #: related objects prefetched for objects
+    geoadmin_prefetch_related = ()
+    #: geoadmin window filter mode: intersects, bbox, bbox_exact
+    geoadmin_bbox_filter = get_option('bbox_filter.mode')
+    #: geoadmin filters every field separately joining results by the UNION
+    geoadmin_bbox_union = get_option('bbox_filter.union')
+    #: whether the API returns only objects not known by the map
+    geoadmin_delta = get_option('delta.enabled')
+    #: max number of known objects passed by the map to get the delta
+    geoadmin_delta_max_known = get_option('delta.max_known')
+    #: max length of the list of known objects passed by the map in the URL
+    geoadmin_delta_max_known_length = get_option('delta.max_known_length')
+    #: delay of the map request after the last move, in milliseconds
+    geoadmin_client_fetch_delay = get_option('client.fetch_delay')
+    #: number of responses cached by the map
+    geoadmin_client_cache_size = get_option('client.cache_size')
+    #: lifetime of responses cached by the map, in seconds
+    geoadmin_client_cache_max_age = get_option('client.cache_max_age')
+    #: whether the map stores cached responses in the browser IndexedDB
+    geoadmin_client_persistent_cache = get_option('client.persistent_cache')
+    #: whether the map skips the request for the view inside the previous response window
+    geoadmin_client_skip_covered = get_option('client.skip_covered')
+    #: format of the API response requested by the map
+    geoadmin_client_format = get_option('client.format')
+    #: whether the API response is validated using ETag and Last-Modified headers
+    geoadmin_conditional = get_option('conditional.enabled')
+    #: time in seconds the API response is considered fresh without validation
+    geoadmin_conditional_max_age = get_option('conditional.max_age')
+    #: whether the API response may be stored only by the browser cache
+    geoadmin_conditional_private = get_option('conditional.private')
+    #: whether the geoadmin responses are compressed
+    geoadmin_compression = get_option('compression.enabled')
+    #: min size of the response content to be compressed
+    geoadmin_compression_min_size = get_option('compression.min_size')
+    #: content encodings in the order of preference
+    geoadmin_compression_encodings = get_option('compression.encodings')
+    #: compression level
+    geoadmin_compression_level = get_option('compression.level')
+    #: number of objects used to calculate the initial extent
+    geoadmin_initial_sample = get_option('initial.sample')
+    #: lifetime of the cached initial extent in seconds
+    geoadmin_initial_timeout = get_option('initial.timeout')
+    #: whether the API returns only primary keys and geometries, while details are requested by the map on demand
+    geoadmin_lazy_details = get_option('details.lazy')
+    #: template of the object popup content returned by the detail API
+    geoadmin_popup_template = get_option('details.popup_template')
+    #: whether geoadmin views are async
+    geoadmin_async = get_option('async.enabled')
+    #: number of threads running geoadmin async views
+    geoadmin_async_workers = get_option('async.workers')
+    #: JSON encoder backend: json, orjson, rapidjson, ujson, or auto
+    geoadmin_encoder = get_option('encoder.backend')
+    #: formats of the export, the first one is used by default
+    geoadmin_export_formats = get_option('export.formats')
+    #: number of objects fetched from the database at once while exported
+    geoadmin_export_chunk_size = get_option('export.chunk_size')
+    #: whether export actions are added to the change list
+    geoadmin_export_actions = get_option('export.actions')
+    #: database alias of map queries, the default routing is used if None
+    geoadmin_using = get_option('database.using')
+    #: time in seconds the default routing is used after the user has modified objects
+    geoadmin_using_sticky = get_option('database.sticky')
+    #: whether durations of the API request processing phases are measured
+    geoadmin_timing = get_option('timing.enabled')
+    #: whether measured durations are returned in the Server-Timing header
+    geoadmin_timing_header = get_option('timing.header')
+    #: whether measured durations are returned in the API response meta for staff users
+    geoadmin_timing_meta = get_option('timing.meta')
+    #: callables or their dotted paths getting measured durations
+    geoadmin_timing_hooks = get_option('timing.hooks')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        track_generation(self.model)
 
     geoadmin_attribution = None
 
     def get_urls(self):
         """Overriden to add necessary admin URLs"""
         from django.conf.urls import url
-        from functools import update_wrapper
 
-        def wrap(view):
+        def wrap(view, cacheable=False, total=False):
             def wrapper(*args, **kwargs):
-                return self.admin_site.admin_view(view)(*args, **kwargs)
-            return update_wrapper(wrapper, view)
+                return self.admin_site.admin_view(view, cacheable)(*args, **kwargs)
+            wrapper = update_wrapper(wrapper, view)
+            if self.geoadmin_async and ASYNC_VIEWS:
+                return self.geoadmin_async_view(wrapper, total)
+            return wrapper
 
         info = self.model._meta.app_label, self.model._meta.model_name
 
         urlpatterns = [
             url(r'^geoadmin_api(?:/?)$',
-                wrap(self.geoadmin_api),
+                wrap(self.geoadmin_api, cacheable=True, total=True),
                 name='%s_%s_geoadmin_api' % info),
+            url(r'^geoadmin_api/(?P<object_id>.+)$',
+                wrap(self.geoadmin_detail),
+                name='%s_%s_geoadmin_detail' % info),
+            url(r'^geoadmin_tiles/(?P<z>\d+)/(?P<x>\d+)/(?P<y>\d+)\.mvt$',
+                wrap(self.geoadmin_tile, cacheable=True),
+                name='%s_%s_geoadmin_tile' % info),
+            url(r'^geoadmin_export(?:/?)$',
+                wrap(self.geoadmin_export),
+                name='%s_%s_geoadmin_export' % info),
             url(r'^geoadmin(?:/?)$',
                 wrap(self.geoadmin_view),
                 name='%s_%s_geoadmin_view' % info),
@@ -52,21 +282,729 @@ class GeoAdminMixin(object):
         urls = super().get_urls()
         return urlpatterns + urls
 
+    def geoadmin_async_view(self, view, total=False):
+        """
+            Geoadmin async view running the view in the thread pool,
+            the total number of objects is calculated concurrently if requested
+        """
+        async def wrapper(request, *args, **kwargs):
+            if total and self.geoadmin_total != 'none' and not self.geoadmin_conditional:
+                if await self.geoadmin_run(self.admin_site.has_permission, request):
+                    queryset = await self.geoadmin_run(self.geoadmin_queryset, request)
+                    self.geoadmin_request_storage(request)['total'] = self.geoadmin_executor().submit(
+                        self.geoadmin_in_thread,
+                        getattr(self, 'geoadmin_total_%s' % self.geoadmin_total), request, queryset
+                    )
+            return await self.geoadmin_run(self.geoadmin_buffered, view, request, *args, **kwargs)
+        return update_wrapper(wrapper, view)
+
+    def geoadmin_run(self, func, *args, **kwargs):
+        """Geoadmin awaitable running the function in the thread pool"""
+        # the running loop is taken explicitly, the get_running_loop is missing before Python 3.7
+        loop = getattr(asyncio, 'get_running_loop', asyncio.get_event_loop)()
+        return loop.run_in_executor(
+            self.geoadmin_executor(), partial(self.geoadmin_in_thread, func, *args, **kwargs)
+        )
+
+    def geoadmin_in_thread(self, func, *args, **kwargs):
+        """Geoadmin function call in the thread pool closing database connections not usable anymore"""
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    def geoadmin_executor(self):
+        """Geoadmin thread pool running async views"""
+        if getattr(self, '_geoadmin_executor', None) is None:
+            self._geoadmin_executor = ThreadPoolExecutor(self.geoadmin_async_workers, thread_name_prefix='geoadmin')
+        return self._geoadmin_executor
+
+    def geoadmin_buffered(self, view, request, *args, **kwargs):
+        """Geoadmin view response having the streamed content consumed in the thread pool"""
+        response = view(request, *args, **kwargs)
+        if not getattr(response, 'streaming', False):
+            return response
+        # the database can't be accessed while the content is streamed from the event loop
+        try:
+            buffered = HttpResponse(b''.join(response.streaming_content), status=response.status_code)
+        finally:
+            response.close()
+        for header, value in response.items():
+            if header.lower() != 'content-length':
+                buffered[header] = value
+        return buffered
+
     def geoadmin_api(self, request):
         """Geoadmin API entry point"""
-        r = HttpResponse(self.geoadmin_serialize(request, self.get_queryset(request)))
+        if self.geoadmin_timing:
+            self.geoadmin_request_storage(request)['timings'] = Timings()
+        queryset = self.geoadmin_queryset(request)
+        # the lagging database may return data older than the generation
+        conditional = self.geoadmin_conditional and not self.geoadmin_lagging(request)
+        if conditional:
+            # validators are taken before the query, modifications committed later bump the generation again
+            etag, last_modified = self.geoadmin_validators(request)
+            r = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if r is not None:
+                return self.geoadmin_conditional_headers(request, r, etag, last_modified)
+        if self.geoadmin_stream:
+            r = StreamingHttpResponse(self.geoadmin_timed_stream(request, queryset, self.geoadmin_serialize_stream(request, queryset)))
+        else:
+            with self.geoadmin_counting(request, queryset):
+                r = HttpResponse(self.geoadmin_serialize(request, queryset))
+        r['Content-Type'] = 'application/json'
+        if conditional:
+            self.geoadmin_conditional_headers(request, r, etag, last_modified)
+        else:
+            add_never_cache_headers(r)
+            patch_vary_headers(r, ('Accept',))
+        with self.geoadmin_phase(request, 'compress'):
+            r = self.geoadmin_compress(request, r)
+        if not r.streaming:
+            self.geoadmin_report_timings(request, r)
+        return r
+
+    def geoadmin_queryset(self, request):
+        """Geoadmin base queryset of map queries routed to the database returned by the `geoadmin_get_using`"""
+        queryset = self.get_queryset(request)
+        using = self.geoadmin_get_using(request)
+        if using:
+            queryset = queryset.using(using)
+        return queryset
+
+    def geoadmin_get_using(self, request):
+        """
+            Geoadmin database alias of map queries, or None to use the default routing,
+            the default routing is used for a while after the user has modified objects to see own changes
+        """
+        if not self.geoadmin_using:
+            return None
+        session = getattr(request, 'session', None)
+        if self.geoadmin_using_sticky and session is not None:
+            written = session.get(WRITTEN_SESSION_KEY)
+            if written is not None and time.time() - written < self.geoadmin_using_sticky:
+                return None
+        return self.geoadmin_using
+
+    def geoadmin_lagging(self, request):
+        """
+            Geoadmin decision whether the database of map queries may not contain recent modifications yet,
+            responses are not cached and not validated then
+        """
+        storage = self.geoadmin_request_storage(request)
+        if 'lagging' not in storage:
+            using = self.geoadmin_get_using(request)
+            storage['lagging'] = bool(using) and time.time() - get_modified(self.model) < self.geoadmin_using_sticky
+        return storage['lagging']
+
+    def geoadmin_written(self, request):
+        """Geoadmin notification about objects modified by the user"""
+        session = getattr(request, 'session', None)
+        if self.geoadmin_using and self.geoadmin_using_sticky and session is not None:
+            session[WRITTEN_SESSION_KEY] = time.time()
+
+    def save_model(self, request, obj, form, change):
+        """Overriden to notify about modified objects"""
+        super().save_model(request, obj, form, change)
+        self.geoadmin_written(request)
+
+    def delete_model(self, request, obj):
+        """Overriden to notify about modified objects"""
+        super().delete_model(request, obj)
+        self.geoadmin_written(request)
+
+    def delete_queryset(self, request, queryset):
+        """Overriden to notify about modified objects"""
+        super().delete_queryset(request, queryset)
+        self.geoadmin_written(request)
+
+    def geoadmin_phase(self, request, name):
+        """Geoadmin context manager timing the request processing phase"""
+        timings = self.geoadmin_request_storage(request).get('timings')
+        if timings is None:
+            return untimed()
+        return timings.phase(name)
+
+    def geoadmin_counting(self, request, queryset):
+        """Geoadmin context manager counting queries made while the request is processed"""
+        timings = self.geoadmin_request_storage(request).get('timings')
+        if timings is None:
+            return untimed()
+        return timings.counting(connections[queryset.db])
+
+    def geoadmin_timed_stream(self, request, queryset, chunks):
+        """Geoadmin streamed content reporting timings when the stream is finished"""
+        timings = self.geoadmin_request_storage(request).get('timings')
+        if timings is None:
+            yield from chunks
+            return
+        with timings.counting(connections[queryset.db]):
+            for chunk in chunks:
+                timings.bytes += len(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+                yield chunk
+        self.geoadmin_report_timings(request, None)
+
+    def geoadmin_report_timings(self, request, response):
+        """Geoadmin API timings reported by the Server-Timing header, the signal and metrics hooks"""
+        timings = self.geoadmin_request_storage(request).get('timings')
+        if timings is None:
+            return
+        if response is not None:
+            timings.bytes = len(response.content)
+            if self.geoadmin_timing_header:
+                response['Server-Timing'] = timings.header()
+        values = timings.as_dict()
+        api_timed.send(sender=type(self), model_admin=self, request=request, timings=values)
+        for hook in self.geoadmin_timing_hooks:
+            if isinstance(hook, str):
+                hook = import_string(hook)
+            hook(self, request, values)
+
+    def geoadmin_compress(self, request, response):
+        """Geoadmin response compressed using the content encoding accepted by the client"""
+        if not self.geoadmin_compression or response.status_code != 200 or response.has_header('Content-Encoding'):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''), self.geoadmin_compression_encodings)
+        if not encoding:
+            return response
+        if response.streaming:
+            response.streaming_content = compress_stream(
+                response.streaming_content, encoding, self.geoadmin_compression_level
+            )
+            if response.has_header('Content-Length'):
+                del response['Content-Length']
+        else:
+            if len(response.content) < self.geoadmin_compression_min_size:
+                return response
+            content = compress(response.content, encoding, self.geoadmin_compression_level)
+            if len(content) >= len(response.content):
+                return response
+            response.content = content
+            response['Content-Length'] = str(len(content))
+        # the compressed content is not byte-for-byte equal to the uncompressed one
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+        return response
+
+    def geoadmin_detail(self, request, object_id):
+        """Geoadmin detail API entry point"""
+        obj = self.get_object(request, unquote(object_id))
+        if obj is None:
+            raise Http404(_('Object does not exist'))
+        if not self.geoadmin_has_permission(request, obj):
+            raise PermissionDenied
+        r = HttpResponse(self.geoadmin_dumps(request, self.geoadmin_detail_json(request, obj)))
         r['Content-Type'] = 'application/json'
+        return self.geoadmin_compress(request, r)
+
+    def geoadmin_has_permission(self, request, obj=None):
+        """Geoadmin decision whether the user may see objects, the change permission is required before Django 2.1"""
+        if hasattr(self, 'has_view_or_change_permission'):
+            return self.has_view_or_change_permission(request, obj)
+        return self.has_change_permission(request, obj)
+
+    def geoadmin_detail_json(self, request, o):
+        """Geoadmin detail API object data extractor"""
+        js = {
+            'pk': o.pk,
+            'title': self.geoadmin_title(request, o),
+            'url': self.geoadmin_url(request, o),
+            **(
+                {'absolute_url': o.get_absolute_url()}
+                if hasattr(o, 'get_absolute_url')
+                else {}
+            )
+        }
+        return {**js, 'popup': self.geoadmin_popup(request, o, js)}
+
+    def geoadmin_popup(self, request, o, js):
+        """Geoadmin detail API object popup content"""
+        info = self.model._meta.app_label, self.model._meta.model_name
+        return render_to_string(self.geoadmin_popup_template or [
+            'geoadmin/%s/%s/geoadmin_popup.html' % info,
+            'geoadmin/%s/geoadmin_popup.html' % info[0],
+            'geoadmin/geoadmin_popup.html'
+        ], {**js, 'object': o, 'opts': self.model._meta}, request=request)
+
+    def geoadmin_export(self, request):
+        """Geoadmin export entry point streaming objects of the window, or all objects if the window is not passed"""
+        if not self.geoadmin_has_permission(request):
+            raise PermissionDenied
+        queryset = self.geoadmin_queryset(request)
+        if all(request.GET.get(p) for p in ('south', 'west', 'north', 'east')):
+            # the window is not restricted by the max window size here
+            west = max(float(request.GET['west']), -179.9999999999)
+            south = max(float(request.GET['south']), -89.9999999999)
+            east = min(float(request.GET['east']), 180)
+            north = min(float(request.GET['north']), 90)
+            queryset = self.geoadmin_bbox_filter_queryset(request, queryset, self.geoadmin_fields(request), south, west, north, east)
+        return self.geoadmin_export_response(request, queryset, request.GET.get('format') or self.geoadmin_export_formats[0])
+
+    def geoadmin_export_response(self, request, queryset, format):
+        """Geoadmin export response containing objects of the queryset in the format"""
+        if format not in self.geoadmin_export_formats or format not in available_formats():
+            raise Http404(_('Export format is not supported'))
+        using = self.geoadmin_get_using(request)
+        if using:
+            # objects selected by the action are routed too
+            queryset = queryset.using(using)
+        fields = self.geoadmin_fields(request)
+        if format == 'ndjson':
+            r = StreamingHttpResponse(self.geoadmin_export_ndjson(request, queryset, fields), content_type=CONTENT_TYPES[format])
+        else:
+            r = FileResponse(self.geoadmin_export_ogr(request, queryset, fields, format), content_type=CONTENT_TYPES[format])
+        r['Content-Disposition'] = 'attachment; filename="%s.%s"' % (self.model._meta.model_name, format)
         return r
 
+    def geoadmin_export_objects(self, request, queryset, fields):
+        """Geoadmin export objects fetched by chunks using the server-side cursor where supported"""
+        # prefetched objects are not used by the iterator
+        select_related = self.geoadmin_get_select_related(request)
+        if select_related is True:
+            queryset = queryset.select_related()
+        elif select_related:
+            queryset = queryset.select_related(*select_related)
+        return queryset.iterator(chunk_size=self.geoadmin_export_chunk_size)
+
+    def geoadmin_export_ndjson(self, request, queryset, fields):
+        """Geoadmin export generating newline-delimited GeoJSON features"""
+        if self.geoadmin_db_geojson:
+            queryset = queryset.annotate(**{
+                self.geoadmin_db_geojson_name(field_name): AsGeoJSON(field_name, precision=self.geoadmin_db_geojson_precision)
+                for field_name in fields
+            }).defer(*fields)
+        for o in self.geoadmin_export_objects(request, queryset, fields):
+            for feature in self.geoadmin_export_features(request, o, fields):
+                yield self.geoadmin_dumps(request, feature) + '\n'
+
+    def geoadmin_export_features(self, request, o, fields):
+        """Geoadmin export GeoJSON features of the object, one per geometry field"""
+        title = self.geoadmin_title(request, o)
+        for field_name in fields:
+            feature = self.geoadmin_geojson_feature(request, o, field_name)
+            if feature is not None:
+                yield {
+                    'type': 'Feature',
+                    'id': o.pk,
+                    'geometry': feature['geometry'],
+                    'properties': {
+                        **self.geoadmin_field_meta(request, field_name), **(feature['properties'] or {}),
+                        'pk': o.pk, 'title': title,
+                    },
+                }
+
+    def geoadmin_export_ogr(self, request, queryset, fields, format):
+        """Geoadmin export file written by the OGR driver of the format"""
+        directory = tempfile.mkdtemp(prefix='geoadmin')
+        path = os.path.join(directory, '%s.%s' % (self.model._meta.model_name, format))
+        try:
+            # the spatial index is written when all features are known, so the file is finished before sending
+            write_ogr(path, format, self.model._meta.model_name, (
+                (
+                    o.pk, self.geoadmin_title(request, o),
+                    {
+                        **self.geoadmin_field_meta(request, field_name),
+                        **(self.geoadmin_geojson_feature_properties(request, o, field_name) or {}),
+                    },
+                    getattr(o, field_name),
+                )
+                for o in self.geoadmin_export_objects(request, queryset, fields)
+                for field_name in fields
+                if getattr(o, field_name)
+            ))
+        except Exception:
+            shutil.rmtree(directory, ignore_errors=True)
+            raise
+        # the directory is removed when the response is closed, even if the content has not been read
+        return TemporaryFile(path, directory)
+
+    def get_actions(self, request):
+        """Overriden to add export actions"""
+        actions = super().get_actions(request)
+        if not self.geoadmin_export_actions or self.actions is None or IS_POPUP_VAR in request.GET:
+            return actions
+        for format in self.geoadmin_export_formats:
+            if format in available_formats():
+                actions['geoadmin_export_%s' % format] = self.geoadmin_export_action(format)
+        return actions
+
+    def geoadmin_export_action(self, format):
+        """Geoadmin admin action exporting selected objects in the format"""
+        def action(model_admin, request, queryset):
+            return model_admin.geoadmin_export_response(request, queryset, format)
+        name = 'geoadmin_export_%s' % format
+        return action, name, _('Export selected %%(verbose_name_plural)s to %s') % format.upper()
+
+    def geoadmin_validators(self, request):
+        """Geoadmin API ETag and Last-Modified timestamp of the response calculated without the query"""
+        etag = 'W/"%s"' % make_key(
+            'etag', self.model._meta.label_lower, type(self).__module__, type(self).__qualname__,
+            get_generation(self.model), self.geoadmin_cache_scope(request), get_language(),
+            self.geoadmin_format(request), sorted(request.GET.lists()), __version__
+        )
+        return etag, int(get_modified(self.model))
+
+    def geoadmin_conditional_headers(self, request, response, etag, last_modified):
+        """Geoadmin API validation and caching headers of the response"""
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        patch_cache_control(
+            response, max_age=self.geoadmin_conditional_max_age, must_revalidate=True,
+            **({'private': True} if self.geoadmin_conditional_private else {'public': True})
+        )
+        patch_vary_headers(response, ('Accept', 'Cookie'))
+        return response
+
+    def geoadmin_tile(self, request, z, x, y):
+        """Geoadmin vector tile entry point"""
+        z, x, y = int(z), int(x), int(y)
+        if not tile_valid(z, x, y):
+            raise Http404(_('Tile does not exist'))
+        content = b''
+        if z >= self.geoadmin_tiles_min_zoom:
+            content = self.geoadmin_tile_content(request, self.geoadmin_queryset(request), z, x, y)
+        r = HttpResponse(content)
+        r['Content-Type'] = 'application/vnd.mapbox-vector-tile'
+        patch_cache_control(r, private=True, max_age=self.geoadmin_tiles_max_age)
+        return self.geoadmin_compress(request, r)
+
+    def geoadmin_tile_content(self, request, queryset, z, x, y):
+        """Geoadmin vector tile content generator"""
+        fields = self.geoadmin_fields(request)
+        if self.geoadmin_tile_native(request, queryset):
+            return b''.join(self.geoadmin_tile_layer_native(request, queryset, f, z, x, y) for f in fields)
+        return b''.join(self.geoadmin_tile_layer(request, queryset, f, z, x, y) for f in fields)
+
+    def geoadmin_tile_native(self, request, queryset):
+        """Geoadmin vector tile decision whether the database generates tiles natively"""
+        return bool(getattr(connections[queryset.db].ops, 'postgis', False))
+
+    def geoadmin_tile_queryset(self, request, queryset, field_name, z, x, y):
+        """Geoadmin vector tile queryset of objects having the field intersecting the tile"""
+        envelope = self.geoadmin_envelope(*tile_bounds(z, x, y))
+        return queryset.filter(self.geoadmin_bbox_q(request, field_name, envelope)).order_by()
+
+    def geoadmin_tile_layer_native(self, request, queryset, field_name, z, x, y):
+        """Geoadmin vector tile layer of the field generated by the ST_AsMVT on the database side"""
+        queryset = self.geoadmin_tile_queryset(request, queryset, field_name, z, x, y).annotate(
+            geoadmin_field=Value(field_name, output_field=CharField()),
+            geoadmin_mvt_geom=AsMVTGeom(
+                Transform(AsGeometry(field_name), 3857),
+                MakeEnvelope(*tile_mercator_bounds(z, x, y), 3857),
+                self.geoadmin_tiles_extent,
+                self.geoadmin_tiles_buffer,
+            )
+        ).values_list('pk', 'geoadmin_field', 'geoadmin_mvt_geom')
+        sql, params = queryset.query.get_compiler(queryset.db).as_sql()
+        with connections[queryset.db].cursor() as cursor:
+            cursor.execute(
+                'SELECT ST_AsMVT(t, %%s, %%s, %%s) FROM (%s) AS t(pk, field, geom)' % sql,
+                [field_name, self.geoadmin_tiles_extent, 'geom'] + list(params)
+            )
+            row = cursor.fetchone()
+        return bytes(row[0]) if row and row[0] else b''
+
+    def geoadmin_tile_layer(self, request, queryset, field_name, z, x, y):
+        """Geoadmin vector tile layer of the field encoded on the python side"""
+        queryset = self.geoadmin_tile_queryset(request, queryset, field_name, z, x, y)
+        return encode_layer(field_name, (
+            (pk, geometry, {'pk': pk, 'field': field_name})
+            for pk, geometry in queryset.values_list('pk', field_name).iterator()
+        ), z, x, y, self.geoadmin_tiles_extent)
+
     def geoadmin_serialize(self, request, queryset):
         """Geoadmin API data serializer"""
         js = self.geoadmin_list_json(request, queryset)
-        return json.dumps(js)
+        if self.geoadmin_format(request) == 'columnar':
+            with self.geoadmin_phase(request, 'serialize'):
+                js = self.geoadmin_columnar_json(request, js)
+        timings = self.geoadmin_request_storage(request).get('timings')
+        if timings is not None and self.geoadmin_timing_meta and request.user.is_staff:
+            # the encoding phase is not finished yet and reported by the header only
+            js['meta']['timings'] = timings.as_dict()
+        with self.geoadmin_phase(request, 'encode'):
+            return self.geoadmin_dumps(request, js)
+
+    def geoadmin_format(self, request):
+        """Geoadmin API response format requested by the format parameter or the Accept header"""
+        format = request.GET.get('format')
+        if format in ('json', 'columnar'):
+            return format
+        if COLUMNAR_MEDIA_TYPE in request.META.get('HTTP_ACCEPT', ''):
+            return 'columnar'
+        return 'json'
+
+    def geoadmin_columnar_json(self, request, js):
+        """Geoadmin API response converted to parallel arrays of object attributes"""
+        objects = js['objects']
+        template = self.geoadmin_url_template(request)
+        columns = {'pk': [o['pk'] for o in objects]}
+        if any('title' in o for o in objects):
+            columns['title'] = [o.get('title') for o in objects]
+        if any(o.get('url', format_url(template, o['pk'])) != format_url(template, o['pk']) for o in objects):
+            columns['url'] = [o.get('url') for o in objects]
+        if any('absolute_url' in o for o in objects):
+            columns['absolute_url'] = [o.get('absolute_url') for o in objects]
+        columns['fields'] = {
+            field_name: self.geoadmin_columnar_field(request, objects, field_name)
+            for field_name in self.geoadmin_fields(request)
+        }
+        return {
+            **js,
+            'meta': {**js['meta'], 'format': 'columnar', 'url_template': template.replace(PK_PLACEHOLDER, '{pk}')},
+            'objects': columns,
+        }
+
+    def geoadmin_columnar_field(self, request, objects, field_name):
+        """
+            Geoadmin API columns of the field, containing x and y coordinate arrays if all geometries are points,
+            or an array of geometries otherwise
+        """
+        features = [
+            next((f for f in o['geo']['features'] if (f['properties'] or {}).get('name') == field_name), None)
+            for o in objects
+        ]
+        geometries = [
+            (json.loads(f['geometry'].value) if isinstance(f['geometry'], RawJSON) else f['geometry']) if f else None
+            for f in features
+        ]
+        if all(g is None or g['type'] == 'Point' for g in geometries):
+            column = {
+                'x': [g['coordinates'][0] if g else None for g in geometries],
+                'y': [g['coordinates'][1] if g else None for g in geometries],
+            }
+        else:
+            column = {'geometry': geometries}
+        properties = [f['properties'] if f else None for f in features]
+        if any(p not in (None, {'name': field_name}) for p in properties):
+            column['properties'] = properties
+        return column
+
+    def geoadmin_serialize_stream(self, request, queryset):
+        """Geoadmin API data serializer generating output chunks"""
+        if any([
+            self.geoadmin_cache, self.geoadmin_delta_known(request) is not None, self.geoadmin_format(request) != 'json',
+            # the stream doesn't call customized extractors
+            overridden(self, 'geoadmin_list_json'), overridden(self, 'geoadmin_list_objects'),
+            # the iterator ignores prefetching before Django 4.1
+            self.geoadmin_prefetch_related and django.VERSION < (4, 1),
+        ]):
+            yield self.geoadmin_serialize(request, queryset)
+            return
+        fields = self.geoadmin_fields(request)
+        generation = get_generation(self.model) if self.geoadmin_delta else None
+        with self.geoadmin_phase(request, 'params'):
+            south, west, north, east = self.geoadmin_params(request, queryset, fields)
+        if self.geoadmin_cluster_required(request, queryset, fields, south, west, north, east):
+            yield self.geoadmin_dumps(request, self.geoadmin_cluster_json(request, queryset, fields, south, west, north, east))
+            return
+        south, west, north, east, warning = self.geoadmin_restrict_window(request, queryset, south, west, north, east)
+        objects = self.geoadmin_filter_objects(
+            request, queryset, fields, south, west, north, east
+        ).iterator(chunk_size=self.geoadmin_stream_chunk_size)
+        yield '{"objects": ['
+        count = 0
+        for o in objects:
+            if count:
+                yield ', '
+            yield self.geoadmin_dumps(request, self.geoadmin_json(request, self.geoadmin_row(o), fields))
+            count += 1
+        yield '], "meta": '
+        meta, unchanged = self.geoadmin_delta_meta(
+            request, self.geoadmin_meta(request, queryset, count, south, west, north, east, warning), generation, []
+        )
+        yield self.geoadmin_dumps(request, meta)
+        yield '}'
+
+    def geoadmin_dumps(self, request, value):
+        """Geoadmin API JSON encoder"""
+        return get_encoder(self.geoadmin_encoder)(value)
 
     def geoadmin_list_json(self, request, queryset):
         """Geoadmin API data extractor"""
         fields = self.geoadmin_fields(request)
-        south, west, north, east = self.geoadmin_params(request, queryset, fields)
+        # the generation is taken before the query, modifications committed later bump it again
+        generation = get_generation(self.model) if self.geoadmin_delta else None
+        with self.geoadmin_phase(request, 'params'):
+            south, west, north, east = self.geoadmin_params(request, queryset, fields)
+            cluster_required = self.geoadmin_cluster_required(request, queryset, fields, south, west, north, east)
+            if not cluster_required:
+                south, west, north, east, warning = self.geoadmin_restrict_window(request, queryset, south, west, north, east)
+        if cluster_required:
+            with self.geoadmin_phase(request, 'clusters'):
+                return self.geoadmin_cluster_json(request, queryset, fields, south, west, north, east)
+        if self.geoadmin_cache:
+            z = zoom_for_window(south, west, north, east)
+            tiles = [(z, x, y) for x, y in tiles_covering(south, west, north, east, z)]
+            if len(tiles) <= self.geoadmin_cache_max_tiles:
+                with self.geoadmin_phase(request, 'cache'):
+                    objects, hits, misses = self.geoadmin_cached_objects(request, queryset, fields, tiles)
+                meta, unchanged = self.geoadmin_delta_meta(request, {
+                    **self.geoadmin_meta(request, queryset, len(objects), south, west, north, east, warning),
+                    'cache': {'hits': hits, 'misses': misses},
+                }, generation, [o['pk'] for o in objects])
+                return {
+                    'meta': meta,
+                    'objects': [o for o in objects if str(o['pk']) not in unchanged],
+                }
+        with self.geoadmin_phase(request, 'fetch'):
+            lst = self.geoadmin_list_objects(request, queryset, fields, south, west, north, east)
+        meta, unchanged = self.geoadmin_delta_meta(
+            request, self.geoadmin_meta(request, queryset, len(lst), south, west, north, east, warning),
+            generation, [o.pk for o in lst]
+        )
+        with self.geoadmin_phase(request, 'serialize'):
+            return {
+                'meta': meta,
+                'objects': [self.geoadmin_json(request, o, fields) for o in lst if str(o.pk) not in unchanged]
+            }
+
+    def geoadmin_delta_meta(self, request, meta, generation, pks):
+        """
+            Geoadmin API delta meta data extractor, returns the meta data
+            and a set of primary keys of objects which are not changed on the map
+        """
+        if not self.geoadmin_delta:
+            return meta, set()
+        if not self.geoadmin_lagging(request):
+            # the map requests the full response next time otherwise
+            meta = {**meta, 'generation': str(generation)}
+        known = self.geoadmin_delta_known(request)
+        if known is None:
+            return meta, set()
+        pks = {str(pk) for pk in pks}
+        meta.update(delta=True, removed=sorted(known - pks))
+        if not self.geoadmin_delta_unchanged(request, generation):
+            return meta, set()
+        return meta, known & pks
+
+    def geoadmin_delta_known(self, request):
+        """Geoadmin API primary keys of objects known by the map, None if the full response is requested"""
+        if not self.geoadmin_delta or 'known' not in request.GET:
+            return None
+        known = set(pk for pk in request.GET['known'].split(',') if pk)
+        if len(known) > self.geoadmin_delta_max_known:
+            return None
+        return known
+
+    def geoadmin_delta_unchanged(self, request, generation):
+        """Geoadmin API decision whether the data is not changed since the previous response"""
+        return request.GET.get('since') == str(generation)
+
+    def geoadmin_cached_objects(self, request, queryset, fields, tiles):
+        """Geoadmin API objects of the (z, x, y) tiles taken from the cache, returns objects, hits and misses"""
+        keys = {
+            self.geoadmin_cache_key(request, fields, z, x, y): (z, x, y)
+            for z, x, y in tiles
+        }
+        cache = get_cache()
+        found = cache.get_many(list(keys))
+        missing = {}
+        for key, (z, x, y) in keys.items():
+            if key not in found:
+                south, west, north, east = tile_bounds(z, x, y)
+                missing[key] = [
+                    self.geoadmin_json(request, o, fields)
+                    for o in self.geoadmin_list_objects(request, queryset, fields, south, west, north, east)
+                ]
+        if missing and not self.geoadmin_lagging(request):
+            cache.set_many(missing, self.geoadmin_cache_timeout)
+        count_stats(self.model, 'hits', len(found))
+        count_stats(self.model, 'misses', len(missing))
+        objects = {}
+        for key in keys:
+            for o in found.get(key, missing.get(key)):
+                objects.setdefault(o['pk'], o)
+        return list(objects.values()), len(found), len(missing)
+
+    def geoadmin_cache_key(self, request, fields, z, x, y):
+        """Geoadmin API cache key of the tile"""
+        return make_key(
+            self.model._meta.label_lower, type(self).__module__, type(self).__qualname__,
+            get_generation(self.model), self.geoadmin_cache_scope(request), get_language(),
+            ','.join(fields), z, x, y, self.geoadmin_lazy_details,
+            *([self.geoadmin_zoom(request)] if any(self.geoadmin_simplify_options(request, f) for f in fields) else [])
+        )
+
+    def geoadmin_cache_scope(self, request):
+        """Geoadmin API cache scope of the data available to the user"""
+        if request.user.is_superuser:
+            return 'superuser'
+        return 'user:%s' % request.user.pk
+
+    def geoadmin_cache_stats(self):
+        """Geoadmin API cache hits and misses counters"""
+        return get_stats(self.model)
+
+    def geoadmin_meta(self, request, queryset, count, south, west, north, east, warning):
+        """Geoadmin API meta data extractor"""
+        total = self.geoadmin_total_count(request, queryset)
+        return {
+            **({'total': total} if total is not None else {}),
+            'version': __version__,
+            'count': count,
+            'south': south,
+            'west': west,
+            'north': north,
+            'east': east,
+            'fields': {
+                field_name: self.geoadmin_field_meta(request, field_name)
+                for field_name in self.geoadmin_fields(request)
+            },
+            **({'warning': warning} if warning else {})
+        }
+
+    def geoadmin_total_count(self, request, queryset):
+        """Geoadmin API total number of objects calculated using the configured strategy"""
+        pending = self.geoadmin_request_storage(request).get('total')
+        with self.geoadmin_phase(request, 'count'):
+            if pending is not None:
+                # calculated concurrently by the async view
+                return pending.result()
+            return getattr(self, 'geoadmin_total_%s' % self.geoadmin_total)(request, queryset)
+
+    def geoadmin_total_exact(self, request, queryset):
+        """Geoadmin API exact total number of objects"""
+        return queryset.count()
+
+    def geoadmin_total_cached(self, request, queryset):
+        """Geoadmin API exact total number of objects cached until the timeout or modification"""
+        cache = get_cache()
+        key = make_key(
+            'total', self.model._meta.label_lower, type(self).__module__, type(self).__qualname__,
+            get_generation(self.model), self.geoadmin_cache_scope(request)
+        )
+        total = cache.get(key)
+        if total is None:
+            total = self.geoadmin_total_exact(request, queryset)
+            if not self.geoadmin_lagging(request):
+                cache.set(key, total, self.geoadmin_total_timeout)
+        return total
+
+    def geoadmin_total_estimated(self, request, queryset):
+        """Geoadmin API total number of objects estimated by the database planner"""
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return self.geoadmin_total_exact(request, queryset)
+        queryset = queryset.order_by().values('pk')
+        sql, params = queryset.query.get_compiler(queryset.db).as_sql()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN (FORMAT JSON) %s' % sql, params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+
+    def geoadmin_total_none(self, request, queryset):
+        """Geoadmin API omitted total number of objects"""
+        return None
+
+    def geoadmin_restrict_window(self, request, queryset, south, west, north, east):
+        """Geoadmin API requested window restricted to the max window size"""
         warning = None
         north_south = abs(north - south)
         east_west = abs(east - west)
@@ -79,60 +1017,293 @@ class GeoAdminMixin(object):
             if east_west >= geoadmin_max_window_lon_size:
                 east = west + (east_west + geoadmin_max_window_lon_size) / 2
                 west = west + (east_west - geoadmin_max_window_lon_size) / 2
-        lst = self.geoadmin_list_objects(request, queryset, fields, south, west, north, east)
+        return south, west, north, east, warning
+
+    def geoadmin_cluster_required(self, request, queryset, fields, south, west, north, east):
+        """Geoadmin API decision whether clusters should be returned instead of objects"""
+        if not self.geoadmin_cluster:
+            return False
+        geoadmin_max_window_lat_size, geoadmin_max_window_lon_size = self.geoadmin_max_window_size(request, queryset)
+        if abs(north - south) >= geoadmin_max_window_lat_size or abs(east - west) >= geoadmin_max_window_lon_size:
+            return True
+        queryset = self.geoadmin_filter_objects(request, queryset, fields, south, west, north, east)
+        return queryset.values('pk')[:self.geoadmin_cluster_threshold + 1].count() > self.geoadmin_cluster_threshold
+
+    def geoadmin_cluster_json(self, request, queryset, fields, south, west, north, east):
+        """Geoadmin API clusters data extractor"""
+        clusters = []
+        for field_name in fields:
+            clusters += self.geoadmin_list_clusters(request, queryset, field_name, south, west, north, east)
+        count = self.geoadmin_bbox_filter_queryset(request, queryset, fields, south, west, north, east).count()
         return {
             'meta': {
-                'total': queryset.count(),
-                'version': __version__,
-                'count': len(lst),
-                'south': south,
-                'west': west,
-                'north': north,
-                'east': east,
-                **({'warning': warning} if warning else {})
+                **self.geoadmin_meta(request, queryset, count, south, west, north, east, None),
+                'clustered': True,
             },
-            'objects': [self.geoadmin_json(request, o, fields) for o in lst]
+            'objects': [],
+            'clusters': clusters,
         }
 
+    def geoadmin_list_clusters(self, request, queryset, field_name, south, west, north, east):
+        """Geoadmin API clusters of one field calculated on the database side"""
+        size = max(abs(north - south), abs(east - west)) / self.geoadmin_cluster_grid_size
+        centroid = Centroid(AsGeometry(field_name))
+        envelope = self.geoadmin_envelope(south, west, north, east)
+        rows = queryset.filter(self.geoadmin_bbox_q(request, field_name, envelope)).annotate(
+            geoadmin_cell=SnapToGrid(centroid, size)
+        ).values('geoadmin_cell').annotate(
+            geoadmin_count=Count('pk'),
+            geoadmin_lon=Avg(X(centroid)),
+            geoadmin_lat=Avg(Y(centroid)),
+            geoadmin_extent=Extent(AsGeometry(field_name)),
+        ).order_by()
+        verbose_name = str(self.model._meta.get_field(field_name).verbose_name)
+        return [
+            {
+                'field': field_name,
+                'verbose_name': verbose_name,
+                'count': row['geoadmin_count'],
+                'centroid': [row['geoadmin_lon'], row['geoadmin_lat']],
+                'bbox': list(row['geoadmin_extent']),
+            }
+            for row in rows
+        ]
+
     def geoadmin_max_window_size(self, request, queryset):
         """Returns geoadmin API max window"""
         return self.geoadmin_max_window_lat_size, self.geoadmin_max_window_lon_size
 
     def geoadmin_params(self, request, queryset, fields):
         """Geoadmin API parameters translator"""
-        latlon = self.geoadmin_initial(request, queryset, fields)
-        west = max(float(request.GET.get('west', latlon[1] - 0.01)), -179.9999999999)
-        south = max(float(request.GET.get('south', latlon[0] - 0.01)), -89.9999999999)
-        east = min(float(request.GET.get('east', latlon[1] + 0.01)), 180)
-        north = min(float(request.GET.get('north', latlon[0] + 0.01)), 90)
+        if all(request.GET.get(p) for p in ('south', 'west', 'north', 'east')):
+            latlon = None
+        else:
+            latlon = self.geoadmin_initial(request, queryset, fields)
+        west = max(float(request.GET.get('west') or latlon[1] - 0.01), -179.9999999999)
+        south = max(float(request.GET.get('south') or latlon[0] - 0.01), -89.9999999999)
+        east = min(float(request.GET.get('east') or latlon[1] + 0.01), 180)
+        north = min(float(request.GET.get('north') or latlon[0] + 0.01), 90)
         return south, west, north, east
 
     def geoadmin_initial(self, request, queryset, fields):
         """Geoadmin API default parameters"""
-        # TODO
-        if queryset:
-            instance = queryset[0]
-        else:
+        extent = self.geoadmin_initial_extent(request, queryset, fields)
+        if not extent:
             return 0, 0
-        bb = MultiPoint([getattr(instance, f).centroid for f in fields]).extent
-        return (bb[3] + bb[1]) / 2., (bb[2] + bb[0]) / 2.
+        south, west, north, east = extent
+        return (south + north) / 2., (west + east) / 2.
+
+    def geoadmin_initial_extent(self, request, queryset, fields):
+        """Geoadmin API south, west, north, east extent of the objects sample, cached per admin until the modification"""
+        cache = get_cache()
+        key = make_key(
+            'initial', self.model._meta.label_lower, type(self).__module__, type(self).__qualname__,
+            get_generation(self.model), self.geoadmin_cache_scope(request), ','.join(fields)
+        )
+        extent = cache.get(key)
+        if extent is None:
+            extent = self.geoadmin_calculate_extent(request, queryset, fields) or ()
+            if not self.geoadmin_lagging(request):
+                cache.set(key, extent, self.geoadmin_initial_timeout)
+        return extent or None
+
+    def geoadmin_calculate_extent(self, request, queryset, fields):
+        """Geoadmin API south, west, north, east extent of the objects sample calculated on the database side"""
+        if not fields:
+            return None
+        sample = queryset.order_by()[:self.geoadmin_initial_sample]
+        extents = [e for e in sample.aggregate(**{
+            'geoadmin_extent_%s' % f: Extent(AsGeometry(f)) for f in fields
+        }).values() if e]
+        if not extents:
+            return None
+        return (
+            min(e[1] for e in extents), min(e[0] for e in extents),
+            max(e[3] for e in extents), max(e[2] for e in extents),
+        )
 
     def geoadmin_list_objects(self, request, queryset, fields, south, west, north, east):
         """Geoadmin API data requester"""
+        return [
+            self.geoadmin_row(o)
+            for o in self.geoadmin_filter_objects(request, queryset, fields, south, west, north, east)
+        ]
+
+    def geoadmin_filter_objects(self, request, queryset, fields, south, west, north, east):
+        """Geoadmin API queryset filter"""
+        queryset = self.geoadmin_bbox_filter_queryset(request, queryset, fields, south, west, north, east)
+        queryset = self.geoadmin_annotate_geometry(request, queryset, fields)
+        queryset = self.geoadmin_prune_columns(request, queryset, fields)
+        if self.geoadmin_values_allowed(request):
+            return queryset
+        return self.geoadmin_related_objects(request, queryset)
+
+    def geoadmin_related_objects(self, request, queryset):
+        """Geoadmin API queryset fetching related objects used to build the response together with objects"""
+        select_related = self.geoadmin_get_select_related(request)
+        if select_related is True:
+            queryset = queryset.select_related()
+        elif select_related:
+            queryset = queryset.select_related(*select_related)
+        if self.geoadmin_prefetch_related:
+            queryset = queryset.prefetch_related(*self.geoadmin_prefetch_related)
+        return queryset
+
+    def geoadmin_get_select_related(self, request):
+        """Geoadmin API related objects fetched together with objects"""
+        if self.geoadmin_select_related is None:
+            return self.list_select_related
+        return self.geoadmin_select_related
+
+    def geoadmin_annotate_geometry(self, request, queryset, fields):
+        """Geoadmin API queryset annotated by geometries prepared on the database side"""
+        zoom = self.geoadmin_zoom(request)
+        annotations = {}
+        for field_name in fields:
+            simplified = self.geoadmin_simplified_expression(request, field_name, zoom)
+            if self.geoadmin_db_geojson:
+                annotations[self.geoadmin_db_geojson_name(field_name)] = AsGeoJSON(
+                    field_name if simplified is None else simplified,
+                    precision=self.geoadmin_geojson_precision(request, field_name, zoom)
+                )
+            elif simplified is not None:
+                annotations[self.geoadmin_simplified_name(field_name)] = simplified
+        if not annotations:
+            return queryset
+        queryset = queryset.annotate(**annotations)
+        return queryset.defer(*[
+            field_name for field_name in fields
+            if self.geoadmin_geometry_column(queryset, field_name) != field_name
+        ])
+
+    def geoadmin_geometry_column(self, queryset, field_name):
+        """Geoadmin API name of the queryset column containing the field geometry"""
+        for name in (self.geoadmin_db_geojson_name(field_name), self.geoadmin_simplified_name(field_name)):
+            if name in queryset.query.annotations:
+                return name
+        return field_name
+
+    def geoadmin_zoom(self, request):
+        """Geoadmin API map zoom level passed by the client, or None"""
+        try:
+            return max(0, min(int(request.GET['zoom']), 30))
+        except (KeyError, ValueError):
+            return None
+
+    def geoadmin_pixel_size(self, zoom):
+        """Geoadmin API size of the map pixel in degrees on the zoom level"""
+        return 360. / (256 << zoom)
+
+    def geoadmin_simplify_options(self, request, field_name):
+        """Geoadmin API geometry simplification options of the field, or None"""
+        return self.geoadmin_feature_options.get(field_name, {}).get('simplify')
+
+    def geoadmin_simplified_expression(self, request, field_name, zoom):
+        """Geoadmin API expression simplifying the field geometry for the zoom level, or None"""
+        options = self.geoadmin_simplify_options(request, field_name)
+        if zoom is None or not options:
+            return None
+        pixel = self.geoadmin_pixel_size(zoom)
+        function = SimplifyPreserveTopology if options.get('preserve_topology', True) else Simplify
+        expression = function(AsGeometry(field_name), options.get('tolerance', 1.) * pixel)
+        if options.get('quantize', 0.5):
+            expression = SnapToGrid(expression, options.get('quantize', 0.5) * pixel)
+        return expression
+
+    def geoadmin_geojson_precision(self, request, field_name, zoom):
+        """Geoadmin API number of decimal digits of database-generated GeoJSON coordinates"""
+        options = self.geoadmin_simplify_options(request, field_name)
+        if zoom is None or not options or not options.get('quantize', 0.5):
+            return self.geoadmin_db_geojson_precision
+        digits = int(math.ceil(-math.log10(options.get('quantize', 0.5) * self.geoadmin_pixel_size(zoom))))
+        return max(0, min(self.geoadmin_db_geojson_precision, digits))
+
+    def geoadmin_simplified_name(self, field_name):
+        """Geoadmin API name of the annotation containing simplified geometry"""
+        return 'geoadmin_simplified_%s' % field_name
+
+    def geoadmin_envelope(self, south, west, north, east):
+        """Geoadmin API window polygon"""
+        return Polygon([
+            (west, south), (west, north),
+            (east, north), (east, south),
+            (west, south)
+        ], srid=4326)
+
+    def geoadmin_bbox_q(self, request, field_name, envelope):
+        """Geoadmin API filter condition of the field intersecting the window"""
+        if self.geoadmin_bbox_filter == 'intersects':
+            return Q(**{'%s__intersects' % field_name: envelope})
+        q_filter = Q(**{'%s__bboverlaps' % field_name: envelope})
+        if self.geoadmin_bbox_filter == 'bbox_exact':
+            q_filter &= Q(**{'%s__intersects' % field_name: envelope})
+        return q_filter
+
+    def geoadmin_bbox_filter_queryset(self, request, queryset, fields, south, west, north, east):
+        """Geoadmin API queryset of objects having any field intersecting the window"""
+        envelope = self.geoadmin_envelope(south, west, north, east)
+        if self.geoadmin_bbox_union and len(fields) > 1:
+            union = None
+            for field_name in fields:
+                part = queryset.filter(self.geoadmin_bbox_q(request, field_name, envelope)).order_by().values('pk')
+                union = part if union is None else union.union(part)
+            sql, params = union.query.get_compiler(union.db).as_sql()
+            return queryset.filter(pk__in=RawSQL(sql, params))
         q_filter = Q()
         for field_name in fields:
-            q_filter = q_filter | Q(**{
-                '%s__intersects' % field_name: Polygon([
-                    (west, south), (west, north),
-                    (east, north), (east, south),
-                    (west, south)
-                ], srid=4326)
-            })
-        queryset = queryset.filter(q_filter)
-        return list(queryset)
+            q_filter |= self.geoadmin_bbox_q(request, field_name, envelope)
+        return queryset.filter(q_filter)
+
+    def geoadmin_prune_columns(self, request, queryset, fields):
+        """Geoadmin API queryset restricted to columns necessary to build the response"""
+        only_fields = list(self.geoadmin_only_fields or [])
+        if self.geoadmin_values_allowed(request):
+            geometry = [self.geoadmin_geometry_column(queryset, field_name) for field_name in fields]
+            return queryset.values(*dict.fromkeys(['pk'] + geometry + list(self.geoadmin_title_fields) + only_fields))
+        if self.geoadmin_only_fields is not None:
+            only_fields += [
+                field_name for field_name in fields
+                if self.geoadmin_geometry_column(queryset, field_name) == field_name
+            ]
+            # title fields are loaded one by one otherwise
+            only_fields += [name.split('__')[0] for name in self.geoadmin_title_fields or []]
+            # foreign keys of related objects fetched together can't be deferred
+            select_related = self.geoadmin_get_select_related(request)
+            if select_related and select_related is not True:
+                only_fields += [lookup.split('__')[0] for lookup in select_related]
+            return queryset.only(self.model._meta.pk.name, *dict.fromkeys(only_fields))
+        return queryset
+
+    def geoadmin_values_allowed(self, request):
+        """Geoadmin API decision whether plain values may be fetched instead of model instances"""
+        if self.geoadmin_title_fields is None or hasattr(self.model, 'get_absolute_url'):
+            return False
+        for name in (
+            'geoadmin_json', 'geoadmin_title', 'geoadmin_url', 'geoadmin_geojson',
+            'geoadmin_geojson_feature', 'geoadmin_geojson_feature_geometry',
+            'geoadmin_geojson_feature_properties', 'geoadmin_geojson_feature_options',
+        ):
+            if overridden(self, name):
+                return False
+        return True
+
+    def geoadmin_row(self, o):
+        """Geoadmin API object made from the fetched row"""
+        if isinstance(o, dict):
+            return SimpleNamespace(**o)
+        return o
+
+    def geoadmin_db_geojson_name(self, field_name):
+        """Geoadmin API name of the annotation containing database-generated GeoJSON"""
+        return 'geoadmin_geojson_%s' % field_name
 
     def geoadmin_json(self, request, o, field_names):
         """Geoadmin API object data extractor"""
+        if self.geoadmin_lazy_details:
+            return {
+                'pk': o.pk,
+                'geo': self.geoadmin_geojson(request, o, field_names),
+            }
         return {
             'pk': o.pk,
             'title': self.geoadmin_title(request, o),
@@ -147,8 +1318,24 @@ class GeoAdminMixin(object):
 
     def geoadmin_url(self, request, o):
         """Geoadmin API object reference URL generator"""
-        info = self.model._meta.app_label, self.model._meta.model_name
-        return reverse('admin:%s_%s_change' % info, args=(o.pk,))
+        return format_url(self.geoadmin_url_template(request), o.pk)
+
+    def geoadmin_url_template(self, request):
+        """Geoadmin API object reference URL template calculated once per request"""
+        storage = self.geoadmin_request_storage(request)
+        if 'url_template' not in storage:
+            info = self.model._meta.app_label, self.model._meta.model_name
+            storage['url_template'] = reverse('admin:%s_%s_change' % info, args=(PK_PLACEHOLDER,))
+        return storage['url_template']
+
+    def geoadmin_request_storage(self, request):
+        """Geoadmin API storage of values calculated once per request"""
+        if request is None:
+            return {}
+        storage = getattr(request, '_geoadmin_storage', None)
+        if storage is None:
+            storage = request._geoadmin_storage = {}
+        return storage
 
     def geoadmin_geojson(self, request, o, field_names):
         """Geoadmin API object geojson extractor"""
@@ -173,17 +1360,41 @@ class GeoAdminMixin(object):
 
     def geoadmin_geojson_feature_geometry(self, request, o, field_name):
         """Geoadmin API object geojson feature geometry extractor"""
+        name = self.geoadmin_db_geojson_name(field_name)
+        if hasattr(o, name):
+            val = getattr(o, name)
+            if val:
+                return RawJSON(val)
+            return
+        name = self.geoadmin_simplified_name(field_name)
+        if hasattr(o, name):
+            val = getattr(o, name)
+            if val:
+                return json.loads(val.json)
+            return
         val = getattr(o, field_name)
         if val:
             return json.loads(getattr(o, field_name).json)
 
     def geoadmin_geojson_feature_properties(self, request, o, field_name):
         """Geoadmin API object geojson feature properties extractor"""
-        return {
-            'name': field_name,
-            'verbose_name': str(self.model._meta.get_field(field_name).verbose_name),
-            'options': self.geoadmin_geojson_feature_options(request, o, field_name)
-        }
+        if overridden(self, 'geoadmin_geojson_feature_options'):
+            return {
+                **self.geoadmin_field_meta(request, field_name),
+                'options': self.geoadmin_geojson_feature_options(request, o, field_name)
+            }
+        return {'name': field_name}
+
+    def geoadmin_field_meta(self, request, field_name):
+        """Geoadmin API field properties shared by all objects, calculated once per request"""
+        storage = self.geoadmin_request_storage(request).setdefault('fields', {})
+        if field_name not in storage:
+            storage[field_name] = {
+                'name': field_name,
+                'verbose_name': str(self.model._meta.get_field(field_name).verbose_name),
+                'options': self.geoadmin_feature_options.get(field_name, {}),
+            }
+        return storage[field_name]
 
     def geoadmin_geojson_feature_options(self, request, o, field_name):
         """Geoadmin API object geojson feature options extractor"""
@@ -191,6 +1402,11 @@ class GeoAdminMixin(object):
 
     def geoadmin_title(self, request, o):
         """Geoadmin API object title extractor"""
+        if self.geoadmin_title_fields is not None:
+            return ' '.join(
+                str(v) for v in (lookup(o, name) for name in self.geoadmin_title_fields)
+                if v is not None
+            )
         return str(o)
 
     def geoadmin_fields(self, request):
@@ -220,7 +1436,24 @@ class GeoAdminMixin(object):
             'fetch_url': reverse('admin:%s_%s_geoadmin_api' % info),
             'version': __version__,
             'attribution': self.geoadmin_attribution,
+            'tiles': self.geoadmin_tiles,
+            'delta': self.geoadmin_delta,
+            'delta_max_known': self.geoadmin_delta_max_known,
+            'delta_max_known_length': self.geoadmin_delta_max_known_length,
+            'client_options': script_json(self.geoadmin_client_options(request)),
+            'initial_extent': script_json(self.geoadmin_view_extent(request)),
+            'export_url': reverse('admin:%s_%s_geoadmin_export' % info) if self.geoadmin_export_formats else None,
         }
+        if self.geoadmin_tiles:
+            context.update({
+                'tile_url': self.geoadmin_tile_url_template(request),
+                'tile_min_zoom': self.geoadmin_tiles_min_zoom,
+                'tile_fields': script_json({
+                    field_name: self.geoadmin_field_meta(request, field_name)
+                    for field_name in self.geoadmin_fields(request)
+                }),
+                'change_url': self.geoadmin_url_template(request).replace(PK_PLACEHOLDER, '{pk}'),
+            })
 
         request.current_app = self.admin_site.name
 
@@ -230,6 +1463,33 @@ class GeoAdminMixin(object):
             'geoadmin/geoadmin_view.html'
         ], context)
 
+    def geoadmin_tile_url_template(self, request):
+        """Geoadmin vector tile URL template in the form expected by the Leaflet"""
+        info = self.model._meta.app_label, self.model._meta.model_name
+        return reverse(
+            'admin:%s_%s_geoadmin_tile' % info, kwargs={'z': 0, 'x': 0, 'y': 0}
+        ).replace('/0/0/0.mvt', '/{z}/{x}/{y}.mvt')
+
+    def geoadmin_view_extent(self, request):
+        """Geoadmin View initial map bounds, or None if there are no objects"""
+        extent = self.geoadmin_initial_extent(request, self.geoadmin_queryset(request), self.geoadmin_fields(request))
+        if not extent:
+            return None
+        south, west, north, east = extent
+        return [[south, west], [north, east]]
+
+    def geoadmin_client_options(self, request):
+        """Geoadmin View options of fetching objects by the map"""
+        return {
+            'fetchDelay': self.geoadmin_client_fetch_delay,
+            'cacheSize': self.geoadmin_client_cache_size,
+            'cacheMaxAge': self.geoadmin_client_cache_max_age,
+            'persistentCache': self.geoadmin_client_persistent_cache,
+            'skipCovered': self.geoadmin_client_skip_covered,
+            'format': self.geoadmin_client_format,
+            'lazyDetails': self.geoadmin_lazy_details,
+        }
+
     def geoadmin_media(self, request):
         """Geoadmin View media"""
         add_css = tuple(get_option('media.css.additional', []))
@@ -257,6 +1517,9 @@ class GeoAdminMixin(object):
                 get_option('media.js.beautifymarker', ''),
                 get_option('media.js.leaflet-mouse-position', ''),
                 get_option('media.js.leaflet-control-custom', ''),
+            ) + (
+                (get_option('media.js.leaflet-vectorgrid', ''),) if self.geoadmin_tiles else ()
+            ) + (
                 get_option('media.js.geoadmin', ''),
             ) + add_js
         )
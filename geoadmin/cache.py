@@ -0,0 +1,102 @@
+import hashlib
+import time
+from functools import partial
+
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+from .options import get_option
+
+
+def get_cache():
+    """Returns the cache used by the geoadmin"""
+    return caches[get_option('cache.backend')]
+
+
+def make_key(*parts):
+    """Makes the cache key from parts"""
+    return 'geoadmin:%s' % hashlib.md5(':'.join(str(p) for p in parts).encode('utf-8')).hexdigest()
+
+
+def _generation_key(model):
+    return 'geoadmin:generation:%s' % model._meta.label_lower
+
+
+def get_generation(model):
+    """Returns the generation of the model data changed on every model instance modification"""
+    cache = get_cache()
+    key = _generation_key(model)
+    generation = cache.get(key)
+    if generation is None:
+        # the time-based initial value avoids reusing generations after eviction
+        cache.add(key, int(time.time() * 1000), None)
+        generation = cache.get(key)
+    return generation
+
+
+def _modified_key(model):
+    return 'geoadmin:modified:%s' % model._meta.label_lower
+
+
+def get_modified(model):
+    """Returns the timestamp of the last model instance modification known by the cache"""
+    cache = get_cache()
+    key = _modified_key(model)
+    modified = cache.get(key)
+    if modified is None:
+        # nothing is known about modifications before the value has been lost
+        cache.add(key, time.time(), None)
+        modified = cache.get(key)
+    return modified
+
+
+def bump_generation(model):
+    """Starts the new generation of the model data"""
+    cache = get_cache()
+    key = _generation_key(model)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, int(time.time() * 1000), None)
+    cache.set(_modified_key(model), time.time(), None)
+
+
+def _on_change(sender, **kwargs):
+    # data read by concurrent requests before the commit may be stored under the generation bumped at once,
+    # so the generation is bumped again after the commit
+    bump_generation(sender)
+    transaction.on_commit(partial(bump_generation, sender), using=kwargs.get('using'))
+
+
+def track_generation(model):
+    """Connects model modification signals to the generation counter"""
+    uid = 'geoadmin:generation:%s' % model._meta.label_lower
+    post_save.connect(_on_change, sender=model, weak=False, dispatch_uid=uid)
+    post_delete.connect(_on_change, sender=model, weak=False, dispatch_uid=uid)
+
+
+def _stats_key(model, name):
+    return 'geoadmin:stats:%s:%s' % (model._meta.label_lower, name)
+
+
+def count_stats(model, name, delta=1):
+    """Increments the cache statistics counter"""
+    if not delta:
+        return
+    cache = get_cache()
+    key = _stats_key(model, name)
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        if not cache.add(key, delta, None):
+            cache.incr(key, delta)
+
+
+def get_stats(model):
+    """Returns the cache statistics counters"""
+    cache = get_cache()
+    return {
+        name: cache.get(_stats_key(model, name), 0)
+        for name in ('hits', 'misses')
+    }
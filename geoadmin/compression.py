@@ -0,0 +1,117 @@
+import zlib
+
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+def available_encodings():
+    """Returns content encodings supported by installed libraries"""
+    return [
+        encoding for encoding, library in (('br', brotli), ('zstd', zstandard), ('gzip', zlib))
+        if library is not None
+    ]
+
+
+def parse_accept_encoding(header):
+    """Returns a dictionary of content encodings accepted by the client with their quality values"""
+    accepted = {}
+    for item in header.split(','):
+        parts = [p.strip() for p in item.split(';')]
+        if not parts[0]:
+            continue
+        quality = 1.
+        for p in parts[1:]:
+            if p.startswith('q='):
+                try:
+                    quality = float(p[2:])
+                except ValueError:
+                    quality = 0.
+        accepted[parts[0].lower()] = quality
+    return accepted
+
+
+def choose_encoding(header, encodings):
+    """
+        Chooses the content encoding accepted by the client,
+        encodings are listed in the order of the server preference
+    """
+    accepted = parse_accept_encoding(header)
+    available = available_encodings()
+    best = None
+    for encoding in encodings:
+        if encoding not in available:
+            continue
+        quality = accepted.get(encoding, accepted.get('*', 0.))
+        if quality > 0 and (best is None or quality > best[1]):
+            best = (encoding, quality)
+    return best[0] if best else None
+
+
+class Compressor(object):
+    """Incremental compressor of the content encoding"""
+
+    def __init__(self, encoding, level=6):
+        self.encoding = encoding
+        if encoding == 'br':
+            self.compressor = brotli.Compressor(quality=level)
+        elif encoding == 'zstd':
+            self.compressor = zstandard.ZstdCompressor(level=level).compressobj()
+        elif encoding == 'gzip':
+            self.compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        else:
+            raise ValueError('Unsupported content encoding: %s' % encoding)
+
+    def compress(self, data):
+        """Compresses the next part of the content, returns compressed bytes available at the moment"""
+        if self.encoding == 'br':
+            # the brotlipy package names the method differently
+            return getattr(self.compressor, 'process', getattr(self.compressor, 'compress', None))(data)
+        return self.compressor.compress(data)
+
+    def flush(self):
+        """Returns compressed bytes of the content passed until now, keeping the compressor usable"""
+        if self.encoding == 'br':
+            return self.compressor.flush()
+        if self.encoding == 'zstd':
+            return self.compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+        return self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        """Returns the rest of the compressed content"""
+        if self.encoding == 'br':
+            return self.compressor.finish()
+        return self.compressor.flush()
+
+
+def compress(content, encoding, level=6):
+    """Compresses the content using the content encoding"""
+    compressor = Compressor(encoding, level)
+    return compressor.compress(content) + compressor.finish()
+
+
+def compress_stream(chunks, encoding, level=6, flush_size=16384):
+    """
+        Compresses the stream of chunks using the content encoding,
+        the compressed data is flushed to the client after every `flush_size` bytes of the content
+    """
+    compressor = Compressor(encoding, level)
+    pending = 0
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        data = compressor.compress(chunk)
+        pending += len(chunk)
+        if pending >= flush_size:
+            data += compressor.flush()
+            pending = 0
+        if data:
+            yield data
+    yield compressor.finish()
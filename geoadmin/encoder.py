@@ -0,0 +1,112 @@
+import json
+import re
+import uuid
+
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import rapidjson
+except ImportError:
+    rapidjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+
+class RawJSON(object):
+    """Already encoded JSON value which is spliced into the output as is"""
+
+    def __init__(self, value):
+        self.value = value
+
+    def __str__(self):
+        return self.value
+
+    def __repr__(self):
+        return 'RawJSON(%r)' % self.value
+
+
+class Splicer(object):
+    """
+        Replaces `RawJSON` values by unique string markers while the value is encoded,
+        and markers by `RawJSON` values in the encoded output
+    """
+
+    def __init__(self):
+        # the unpredictable marker can't be met in the encoded data
+        self.nonce = uuid.uuid4().hex
+        self.values = []
+
+    def default(self, value):
+        """Returns the marker of the `RawJSON` value, used as a `default` function of the encoder"""
+        if isinstance(value, RawJSON):
+            self.values.append(value.value)
+            return '\x00%s:%d' % (self.nonce, len(self.values) - 1)
+        raise TypeError('Object of type %s is not JSON serializable' % type(value).__name__)
+
+    def splice(self, encoded):
+        """Replaces markers in the encoded output by `RawJSON` values"""
+        if not self.values:
+            return encoded
+        return re.sub(r'"\\u0000%s:(\d+)"' % self.nonce, lambda m: self.values[int(m.group(1))], encoded)
+
+
+def _json_dumps(value, default):
+    return json.dumps(value, default=default)
+
+
+def _orjson_dumps(value, default):
+    return orjson.dumps(value, default=default).decode('utf-8')
+
+
+def _rapidjson_dumps(value, default):
+    return rapidjson.dumps(value, default=default)
+
+
+def _ujson_dumps(value, default):
+    return ujson.dumps(value, default=default, escape_forward_slashes=False)
+
+
+#: JSON encoders by the backend name in the order of preference, with the library they depend on
+BACKENDS = {
+    'orjson': (orjson, _orjson_dumps),
+    'rapidjson': (rapidjson, _rapidjson_dumps),
+    'ujson': (ujson, _ujson_dumps),
+    'json': (json, _json_dumps),
+}
+
+
+def available_backends():
+    """Returns JSON encoder backends supported by installed libraries"""
+    return [name for name, (library, encode) in BACKENDS.items() if library is not None]
+
+
+def get_encoder(backend='json'):
+    """
+        Returns the function encoding the value to the JSON string using the backend and splicing `RawJSON` values as is,
+        the `auto` backend means the most preferred one of installed,
+        the `json` backend from the standard library is used if the library of the backend is not installed
+    """
+    if backend == 'auto':
+        backend = available_backends()[0]
+    if backend not in BACKENDS:
+        raise ValueError('Unsupported JSON encoder backend: %s' % backend)
+    library, encode = BACKENDS[backend]
+    if library is None:
+        encode = _json_dumps
+
+    def encoder(value):
+        splicer = Splicer()
+        return splicer.splice(encode(value, splicer.default))
+    return encoder
+
+
+def dumps(value):
+    """Encodes the value to the string like the `json.dumps` does splicing `RawJSON` values as is"""
+    return get_encoder('json')(value)
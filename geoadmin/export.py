@@ -0,0 +1,84 @@
+import json
+import shutil
+
+
+try:
+    from osgeo import ogr, osr
+except ImportError:
+    ogr = osr = None
+
+
+#: OGR drivers and layer creation options by the export format
+OGR_DRIVERS = {
+    'fgb': ('FlatGeobuf', ['SPATIAL_INDEX=YES']),
+    'gpkg': ('GPKG', ['SPATIAL_INDEX=YES']),
+}
+
+#: content types by the export format
+CONTENT_TYPES = {
+    'ndjson': 'application/geo+json-seq',
+    'fgb': 'application/flatgeobuf',
+    'gpkg': 'application/geopackage+sqlite3',
+}
+
+
+def available_formats():
+    """Returns export formats supported by installed libraries"""
+    return ['ndjson'] + [
+        format for format, (driver, options) in OGR_DRIVERS.items()
+        if ogr is not None and ogr.GetDriverByName(driver) is not None
+    ]
+
+
+def write_ogr(path, format, layer_name, features):
+    """
+        Writes the file of the export format using the OGR driver,
+        features are passed as (pk, title, properties, geometry) tuples,
+        where properties are field properties having `name`, `verbose_name` and `options`,
+        and geometry is a GEOS geometry in the EPSG:4326
+    """
+    driver, options = OGR_DRIVERS[format]
+    source = ogr.GetDriverByName(driver).CreateDataSource(path)
+    srs = osr.SpatialReference()
+    srs.ImportFromEPSG(4326)
+    if hasattr(srs, 'SetAxisMappingStrategy'):
+        # GDAL 3 follows the authority axis order otherwise
+        srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+    layer = source.CreateLayer(layer_name, srs, ogr.wkbUnknown, options)
+    for name in ('pk', 'title', 'field', 'verbose_name', 'options'):
+        layer.CreateField(ogr.FieldDefn(name, ogr.OFTString))
+    definition = layer.GetLayerDefn()
+    layer.StartTransaction()
+    for pk, title, properties, geometry in features:
+        feature = ogr.Feature(definition)
+        feature.SetField('pk', str(pk))
+        feature.SetField('title', title)
+        feature.SetField('field', properties['name'])
+        feature.SetField('verbose_name', properties.get('verbose_name'))
+        # options are not representable by OGR field types
+        feature.SetField('options', json.dumps(properties.get('options') or {}))
+        feature.SetGeometry(ogr.CreateGeometryFromWkb(bytes(geometry.wkb)))
+        layer.CreateFeature(feature)
+    layer.CommitTransaction()
+    # the file is finished when the data source is released
+    layer = source = None
+
+
+class TemporaryFile(object):
+    """File of the temporary directory which is removed when the file is closed"""
+
+    def __init__(self, path, directory):
+        self.name = path
+        self.directory = directory
+        try:
+            self.file = open(path, 'rb')
+        except Exception:
+            shutil.rmtree(directory, ignore_errors=True)
+            raise
+
+    def read(self, size=-1):
+        return self.file.read(size)
+
+    def close(self):
+        self.file.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
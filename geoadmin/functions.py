@@ -0,0 +1,55 @@
+from django.contrib.gis.db.models import GeometryField
+from django.contrib.gis.db.models.functions import GeomOutputGeoFunc
+from django.db.models import FloatField, Func, Value
+from django.db.models.functions import Cast
+
+
+class AsGeometry(Cast):
+    """Casts the geography expression to the geometry type"""
+
+    def __init__(self, expression, srid=4326):
+        super().__init__(expression, output_field=GeometryField(srid=srid))
+
+
+class X(Func):
+    """X coordinate of the point"""
+    function = 'ST_X'
+    output_field = FloatField()
+
+
+class Y(Func):
+    """Y coordinate of the point"""
+    function = 'ST_Y'
+    output_field = FloatField()
+
+
+class MakeEnvelope(Func):
+    """Rectangular polygon built from the minimal and maximal coordinates"""
+    function = 'ST_MakeEnvelope'
+
+    def __init__(self, xmin, ymin, xmax, ymax, srid, **extra):
+        super().__init__(
+            Value(xmin), Value(ymin), Value(xmax), Value(ymax), Value(srid),
+            output_field=GeometryField(srid=srid), **extra
+        )
+
+
+class AsMVTGeom(Func):
+    """Geometry transformed to the coordinate space of the vector tile"""
+    function = 'ST_AsMVTGeom'
+
+    def __init__(self, expression, bounds, extent=4096, buffer=256, clip=True, **extra):
+        super().__init__(
+            expression, bounds, Value(extent), Value(buffer), Value(clip),
+            output_field=GeometryField(srid=3857), **extra
+        )
+
+
+class Simplify(GeomOutputGeoFunc):
+    """Geometry simplified using the Douglas-Peucker algorithm"""
+    function = 'ST_Simplify'
+
+
+class SimplifyPreserveTopology(GeomOutputGeoFunc):
+    """Geometry simplified keeping it valid"""
+    function = 'ST_SimplifyPreserveTopology'
@@ -0,0 +1,233 @@
+"""
+    Pure python Mapbox Vector Tile encoder, see the specification at
+    https://github.com/mapbox/vector-tile-spec/tree/master/2.1
+"""
+import struct
+
+from .tiles import lat_to_y, lon_to_x
+
+
+POINT = 1
+LINESTRING = 2
+POLYGON = 3
+
+MOVE_TO = 1
+LINE_TO = 2
+CLOSE_PATH = 7
+
+
+def _varint(value):
+    """Encodes the unsigned integer as the protobuf varint"""
+    out = bytearray()
+    while True:
+        b = value & 0x7f
+        value >>= 7
+        if value:
+            out.append(b | 0x80)
+        else:
+            out.append(b)
+            return bytes(out)
+
+
+def _zigzag(value):
+    """Encodes the signed integer using the zigzag encoding"""
+    return (value << 1) ^ (value >> 63)
+
+
+def _key(field, wire_type):
+    return _varint((field << 3) | wire_type)
+
+
+def _bytes(field, value):
+    return _key(field, 2) + _varint(len(value)) + value
+
+
+def _uint(field, value):
+    return _key(field, 0) + _varint(value)
+
+
+def _packed(field, values):
+    return _bytes(field, b''.join(_varint(v) for v in values))
+
+
+def _value(value):
+    """Encodes the feature property value"""
+    if isinstance(value, bool):
+        return _uint(7, int(value))
+    if isinstance(value, int):
+        if value >= 0:
+            return _uint(5, value)
+        return _uint(6, _zigzag(value))
+    if isinstance(value, float):
+        return _key(3, 1) + struct.pack('<d', value)
+    return _bytes(1, str(value).encode('utf-8'))
+
+
+class Projection(object):
+    """Projects longitude and latitude to the integer tile coordinates"""
+
+    def __init__(self, z, x, y, extent):
+        self.z = z
+        self.x = x
+        self.y = y
+        self.extent = extent
+
+    def __call__(self, point):
+        return (
+            int(round((lon_to_x(point[0], self.z) - self.x) * self.extent)),
+            int(round((lat_to_y(point[1], self.z) - self.y) * self.extent)),
+        )
+
+
+def _dedup(points):
+    """Removes consecutive duplicates appeared after the projection"""
+    out = []
+    for p in points:
+        if not out or out[-1] != p:
+            out.append(p)
+    return out
+
+
+def _ring_area(ring):
+    """Doubled signed area of the ring in tile coordinates"""
+    return sum(
+        ring[i][0] * ring[i + 1][1] - ring[i + 1][0] * ring[i][1]
+        for i in range(len(ring) - 1)
+    ) + ring[-1][0] * ring[0][1] - ring[0][0] * ring[-1][1]
+
+
+class GeometryEncoder(object):
+    """Encodes geometry parts to the vector tile command sequence"""
+
+    def __init__(self):
+        self.commands = []
+        self.cursor = (0, 0)
+
+    def command(self, command, count):
+        self.commands.append((command & 0x7) | (count << 3))
+
+    def points(self, points):
+        for p in points:
+            self.commands.append(_zigzag(p[0] - self.cursor[0]))
+            self.commands.append(_zigzag(p[1] - self.cursor[1]))
+            self.cursor = p
+
+    def multipoint(self, points):
+        self.command(MOVE_TO, len(points))
+        self.points(points)
+
+    def linestring(self, points):
+        self.command(MOVE_TO, 1)
+        self.points(points[:1])
+        self.command(LINE_TO, len(points) - 1)
+        self.points(points[1:])
+
+    def ring(self, points):
+        self.linestring(points)
+        self.command(CLOSE_PATH, 1)
+
+
+def _polygon(projection, rings):
+    """Projects polygon rings orienting exterior ring clockwise and interior ones counter-clockwise"""
+    out = []
+    for i, ring in enumerate(rings):
+        ring = _dedup([projection(p) for p in ring])
+        if len(ring) > 1 and ring[0] == ring[-1]:
+            ring = ring[:-1]
+        if len(ring) < 3:
+            if i == 0:
+                return []
+            continue
+        area = _ring_area(ring)
+        if not area:
+            if i == 0:
+                return []
+            continue
+        if (area > 0) != (i == 0):
+            ring = ring[:1] + ring[1:][::-1]
+        out.append(ring)
+    return out
+
+
+def _parts(geometry):
+    """Splits the geometry to simple parts by the geometry type"""
+    geom_type = geometry.geom_type
+    if geom_type == 'GeometryCollection':
+        for g in geometry:
+            yield from _parts(g)
+    elif geom_type.startswith('Multi'):
+        for g in geometry:
+            yield g.geom_type, g.coords
+    else:
+        yield geom_type, geometry.coords
+
+
+def encode_geometry(projection, geometry):
+    """
+        Encodes the geometry to the list of the (type, commands) pairs,
+        one per every vector tile geometry type met in the geometry
+    """
+    points = []
+    lines = []
+    polygons = []
+    for geom_type, coords in _parts(geometry):
+        if geom_type == 'Point':
+            points.append(projection(coords))
+        elif geom_type in ('LineString', 'LinearRing'):
+            line = _dedup([projection(p) for p in coords])
+            if len(line) > 1:
+                lines.append(line)
+        elif geom_type == 'Polygon':
+            polygon = _polygon(projection, coords)
+            if polygon:
+                polygons.append(polygon)
+    result = []
+    if points:
+        encoder = GeometryEncoder()
+        encoder.multipoint(_dedup(points))
+        result.append((POINT, encoder.commands))
+    if lines:
+        encoder = GeometryEncoder()
+        for line in lines:
+            encoder.linestring(line)
+        result.append((LINESTRING, encoder.commands))
+    if polygons:
+        encoder = GeometryEncoder()
+        for polygon in polygons:
+            for ring in polygon:
+                encoder.ring(ring)
+        result.append((POLYGON, encoder.commands))
+    return result
+
+
+def encode_layer(name, features, z, x, y, extent=4096):
+    """
+        Encodes the vector tile layer, features are passed as (id, geometry, properties) tuples,
+        where geometry is a GEOS geometry in the EPSG:4326 and properties is a dictionary
+    """
+    projection = Projection(z, x, y, extent)
+    keys = {}
+    values = {}
+    encoded = []
+    for fid, geometry, properties in features:
+        if not geometry:
+            continue
+        tags = []
+        for k, v in properties.items():
+            tags.append(keys.setdefault(k, len(keys)))
+            tags.append(values.setdefault((type(v), v), len(values)))
+        for geom_type, commands in encode_geometry(projection, geometry):
+            feature = b''
+            if isinstance(fid, int) and fid >= 0:
+                feature += _uint(1, fid)
+            if tags:
+                feature += _packed(2, tags)
+            feature += _uint(3, geom_type) + _packed(4, commands)
+            encoded.append(_bytes(2, feature))
+    if not encoded:
+        return b''
+    layer = _uint(15, 2) + _bytes(1, name.encode('utf-8')) + b''.join(encoded)
+    layer += b''.join(_bytes(3, k.encode('utf-8')) for k in keys)
+    layer += b''.join(_bytes(4, _value(v)) for t, v in values)
+    layer += _uint(5, extent)
+    return _bytes(3, layer)
@@ -24,6 +24,7 @@ DEFAULT = {
             'beautifymarker': '//cdn.jsdelivr.net/npm/beautifymarker/leaflet-beautify-marker-icon.js',
             'leaflet-mouse-position': '//cdn.jsdelivr.net/npm/leaflet-mouse-position/src/L.Control.MousePosition.js',
             'leaflet-control-custom': '//cdn.jsdelivr.net/npm/leaflet-control-custom/Leaflet.Control.Custom.js',
+            'leaflet-vectorgrid': '//unpkg.com/leaflet.vectorgrid@1.3.0/dist/Leaflet.VectorGrid.bundled.js',
             'geoadmin': 'geoadmin/geoadmin.js',
             'additional': [],
         }
@@ -32,6 +33,94 @@ DEFAULT = {
         'lat_size': 0.1,
         'lon_size': 0.1,
     },
+    'db_geojson': {
+        'enabled': False,
+        'precision': 8,
+    },
+    'stream': {
+        'enabled': False,
+        'chunk_size': 2000,
+    },
+    'cluster': {
+        'enabled': False,
+        'threshold': 1000,
+        'grid_size': 16,
+    },
+    'tiles': {
+        'enabled': False,
+        'min_zoom': 10,
+        'extent': 4096,
+        'buffer': 256,
+        'max_age': 60,
+    },
+    'cache': {
+        'enabled': False,
+        'backend': 'default',
+        'timeout': 300,
+        'max_tiles': 16,
+    },
+    'total': {
+        'strategy': 'exact',
+        'timeout': 60,
+    },
+    'bbox_filter': {
+        'mode': 'intersects',
+        'union': False,
+    },
+    'delta': {
+        'enabled': False,
+        'max_known': 300,
+        'max_known_length': 2000,
+    },
+    'client': {
+        'fetch_delay': 500,
+        'cache_size': 16,
+        'cache_max_age': 60,
+        'persistent_cache': False,
+        'skip_covered': True,
+        'format': 'json',
+    },
+    'conditional': {
+        'enabled': False,
+        'max_age': 0,
+        'private': True,
+    },
+    'compression': {
+        'enabled': False,
+        'min_size': 1024,
+        'encodings': ['br', 'zstd', 'gzip'],
+        'level': 6,
+    },
+    'initial': {
+        'sample': 1000,
+        'timeout': 3600,
+    },
+    'details': {
+        'lazy': False,
+        'popup_template': None,
+    },
+    'async': {
+        'enabled': False,
+        'workers': 4,
+    },
+    'encoder': {
+        'backend': 'json',
+    },
+    'export': {
+        'formats': ['ndjson', 'fgb', 'gpkg'],
+        'chunk_size': 2000,
+        'actions': True,
+    },
+    'database': {
+        'using': None,
+        'sticky': 10,
+    },
+    'timing': {
+        'enabled': False,
+        'header': True,
+        'meta': True,
+        'hooks': [],
+    },
 }
 
 
@@ -0,0 +1,6 @@
+from django.dispatch import Signal
+
+
+#: sent after the API request is processed with `model_admin`, `request` and `timings` arguments,
+#: where `timings` is a dictionary of phase durations in milliseconds, number of queries and response size
+api_timed = Signal()
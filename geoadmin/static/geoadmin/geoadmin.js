@@ -7,7 +7,120 @@
 
 if(typeof($) == 'undefined')
     $ = jQuery;
+GeoObjectResponseCache = L.Class.extend({
+    options: {
+        size: 16,
+        maxAge: 60,
+        persistent: false,
+        name: 'geoadmin',
+    },
+    initialize: function(options) {
+        L.Util.setOptions(this, options);
+        this._entries = {};
+    },
+    get: function(key) {
+        var that = this;
+        var entry = this._entries[key];
+        delete this._entries[key];
+        if(this.fresh(entry)) {
+            this._entries[key] = entry;
+            return $.when(entry.value);
+        }
+        return this.database().then(function(db) {
+            var found = $.Deferred();
+            if(!db) {
+                return found.resolve().promise();
+            }
+            var request = db.transaction('responses').objectStore('responses').get(key);
+            request.onsuccess = function() {
+                if(that.fresh(request.result)) {
+                    that.remember(key, request.result);
+                    found.resolve(request.result.value);
+                } else {
+                    if(typeof(request.result) != 'undefined') {
+                        db.transaction('responses', 'readwrite').objectStore('responses').delete(key);
+                    }
+                    found.resolve();
+                }
+            };
+            request.onerror = function() {
+                found.resolve();
+            };
+            return found.promise();
+        });
+    },
+    put: function(key, value) {
+        var that = this;
+        var entry = {time: Date.now(), value: value};
+        this.remember(key, entry);
+        this.database().then(function(db) {
+            if(!db) {
+                return;
+            }
+            var store = db.transaction('responses', 'readwrite').objectStore('responses');
+            store.put(entry, key);
+            // keeps the most recently stored fresh entries, including ones stored by previous pages
+            var kept = 0;
+            store.index('time').openCursor(null, 'prev').onsuccess = function(event) {
+                var cursor = event.target.result;
+                if(!cursor) {
+                    return;
+                }
+                kept += 1;
+                if(kept > that.options.size || !that.fresh(cursor.value)) {
+                    cursor.delete();
+                }
+                cursor.continue();
+            };
+        });
+    },
+    remember: function(key, entry) {
+        // keys keep the insertion order, so the first one is the least recently used
+        delete this._entries[key];
+        this._entries[key] = entry;
+        var keys = Object.keys(this._entries);
+        while(keys.length > this.options.size) {
+            delete this._entries[keys.shift()];
+        }
+    },
+    fresh: function(entry) {
+        return typeof(entry) != 'undefined' && Date.now() - entry.time < this.options.maxAge * 1000;
+    },
+    database: function() {
+        if(typeof(this._database) == 'undefined') {
+            var opened = $.Deferred();
+            if(this.options.persistent && typeof(indexedDB) != 'undefined') {
+                var request = indexedDB.open(this.options.name, 2);
+                request.onupgradeneeded = function(event) {
+                    var store = event.oldVersion < 1 ?
+                        request.result.createObjectStore('responses') :
+                        request.transaction.objectStore('responses');
+                    store.createIndex('time', 'time');
+                };
+                request.onsuccess = function() {
+                    opened.resolve(request.result);
+                };
+                request.onerror = function() {
+                    opened.resolve(null);
+                };
+            } else {
+                opened.resolve(null);
+            }
+            this._database = opened.promise();
+        }
+        return this._database;
+    },
+})
 GeoObjectListLayer = L.LayerGroup.extend({
+    options: {
+        fetchDelay: 500,
+        cacheSize: 16,
+        cacheMaxAge: 60,
+        persistentCache: false,
+        skipCovered: true,
+        format: 'json',
+        lazyDetails: false,
+    },
     initialize: function(options) {
         L.Util.setOptions(this, options);
         var that = this;
@@ -16,14 +129,20 @@ GeoObjectListLayer = L.LayerGroup.extend({
             opts.attribution = options.attribution;
         }
         L.LayerGroup.prototype.initialize.call(this, [], opts);
+        this._cache = new GeoObjectResponseCache({
+            size: this.options.cacheSize,
+            maxAge: this.options.cacheMaxAge,
+            persistent: this.options.persistentCache,
+            name: 'geoadmin:' + this.options.url,
+        });
     },
     onAdd: function(map) {
         this.map = map;
         var that = this;
         this.map.on('resize move zoom', function() {
-            that.schedule_fetch(500);
+            that.schedule_fetch(that.options.fetchDelay);
         })
-        this.schedule_fetch(500);
+        this.schedule_fetch(this.options.fetchDelay);
     },
     fetchUrl: function() {
         return this.options.url;
@@ -39,80 +158,352 @@ GeoObjectListLayer = L.LayerGroup.extend({
             that.fetch();
         }, milliseconds);
     },
+    fetchParams: function() {
+        var bounds = this.map.getBounds();
+        var data = {
+            north: bounds.getNorth(),
+            south: bounds.getSouth(),
+            east: bounds.getEast(),
+            west: bounds.getWest(),
+            zoom: this.map.getZoom(),
+        };
+        if(this.options.format != 'json') {
+            data.format = this.options.format;
+        }
+        if(this.options.delta) {
+            var known = this.knownObjects(bounds);
+            var joined = known.join(',');
+            // known objects are passed in the URL restricted by the request line size limit of servers
+            if(typeof(this._generation) != 'undefined' && known.length <= (this.options.maxKnown || 300) &&
+                    encodeURIComponent(joined).length <= (this.options.maxKnownLength || 2000)) {
+                data.known = joined;
+                data.since = this._generation;
+            }
+        }
+        return data;
+    },
+    covered: function(data) {
+        // the window returned by the previous response contains all objects of the requested one
+        var w = this._window;
+        return this.options.skipCovered && typeof(w) != 'undefined' && w.zoom == data.zoom &&
+            w.south <= data.south && w.west <= data.west && w.north >= data.north && w.east >= data.east;
+    },
     fetch: function() {
         var that = this;
-        return $.ajax({
-            url: that.fetchUrl(),
-            data: {
-                north: that.map.getBounds().getNorth(),
-                south: that.map.getBounds().getSouth(),
-                east: that.map.getBounds().getEast(),
-                west: that.map.getBounds().getWest(),
-            },
-        }).then(function(v) {
-            that.clearLayers();
-            if(typeof(that._warning) != 'undefined') {
-                that._warning.remove();
-                delete that._warning;
+        if(typeof(this._request) != 'undefined') {
+            this._request.abort();
+            delete this._request;
+        }
+        var ticket = this._ticket = (this._ticket || 0) + 1;
+        var data = this.fetchParams();
+        if(this.covered(data)) {
+            return $.when();
+        }
+        // responses to the delta request depend on objects already shown, so are not cached
+        var cacheable = typeof(data.known) == 'undefined' && this.options.cacheSize > 0;
+        var key = this.fetchUrl() + '?' + $.param(data);
+        return (cacheable ? this._cache.get(key) : $.when()).then(function(cached) {
+            if(ticket != that._ticket) {
+                return;
             }
-            if( typeof(v.meta.warning) != 'undefined' ) {
-                that._warning = L.control.custom({
-                    position: 'topright',
-                    content: v.meta.warning,
-                    style: {opacity: 0.7, background: 'white'},
-                }).addTo(that.map);
+            if(typeof(cached) != 'undefined') {
+                debug("geoobject:debug")("GeoObjectList: cached",key);
+                return that.update(cached, data);
             }
-            that.addLayer(L.rectangle(
-                [[v.meta.south, v.meta.east], [v.meta.north, v.meta.west]],
-                {
-                    'stroke': true,
-                    'color': 'green',
-                    'weight': 1,
-                    'dashArray': '1 5',
-                    'fill': false,
-                    'bubblingMouseEvents': false,
+            var request = that._request = $.ajax({
+                url: that.fetchUrl(),
+                data: data,
+            });
+            return request.then(function(v) {
+                if(ticket != that._ticket) {
+                    return;
                 }
-            ))
-            return $.when($.map(v.objects, function(options,k) {
-                return that.addGeoObject(options);
-            }))
+                delete that._request;
+                if(cacheable) {
+                    that._cache.put(key, v);
+                }
+                return that.update(v, data);
+            });
+        });
+    },
+    update: function(v, data) {
+        var that = this;
+        if(v.meta.format == 'columnar') {
+            v = $.extend({}, v, {objects: this.decodeColumnar(v.objects, v.meta.url_template)});
+        }
+        if(v.meta.delta) {
+            $.each(v.meta.removed, function(k, pk) {
+                that.removeGeoObject(pk);
+            });
+            that.clearDecorations();
+        } else {
+            that.clearLayers();
+            that._objects = {};
+            that._decorations = [];
+            that._details = {};
+        }
+        that._generation = v.meta.generation;
+        that._fields = v.meta.fields || {};
+        if(v.meta.clustered || typeof(v.meta.warning) != 'undefined') {
+            delete that._window;
+        } else {
+            that._window = {
+                south: v.meta.south, west: v.meta.west, north: v.meta.north, east: v.meta.east, zoom: data.zoom,
+            };
+        }
+        if(typeof(that._warning) != 'undefined') {
+            that._warning.remove();
+            delete that._warning;
+        }
+        if( typeof(v.meta.warning) != 'undefined' ) {
+            that._warning = L.control.custom({
+                position: 'topright',
+                content: v.meta.warning,
+                style: {opacity: 0.7, background: 'white'},
+            }).addTo(that.map);
+        }
+        that.addDecoration(L.rectangle(
+            [[v.meta.south, v.meta.east], [v.meta.north, v.meta.west]],
+            {
+                'stroke': true,
+                'color': 'green',
+                'weight': 1,
+                'dashArray': '1 5',
+                'fill': false,
+                'bubblingMouseEvents': false,
+            }
+        ))
+        $.map(v.clusters || [], function(cluster, k) {
+            return that.addCluster(cluster);
         })
+        return $.when($.map(v.objects, function(options,k) {
+            that.removeGeoObject(options.pk);
+            return that.addGeoObject(options);
+        }))
+    },
+    decodeColumnar: function(columns, urlTemplate) {
+        // restores the list of objects from parallel arrays of the columnar response
+        var that = this;
+        return $.map(columns.pk, function(pk, i) {
+            var features = [];
+            $.each(columns.fields, function(name, column) {
+                var geometry = column.geometry ? column.geometry[i] : (
+                    column.x[i] === null ? null : {type: 'Point', coordinates: [column.x[i], column.y[i]]}
+                );
+                if(geometry) {
+                    features.push({
+                        type: 'Feature',
+                        properties: column.properties ? column.properties[i] : {name: name},
+                        geometry: geometry,
+                    });
+                }
+            });
+            var o = {
+                pk: pk,
+                title: columns.title ? columns.title[i] : undefined,
+                url: columns.url ? columns.url[i] : that.objectUrl(urlTemplate, pk),
+                geo: {type: 'FeatureCollection', features: features},
+            };
+            if(columns.absolute_url && columns.absolute_url[i] !== null) {
+                o.absolute_url = columns.absolute_url[i];
+            }
+            return o;
+        });
+    },
+    objectUrl: function(urlTemplate, pk) {
+        // quotes the primary key keeping characters allowed in the URL path, as the server does
+        var quoted = encodeURIComponent(String(pk)).replace(/%(24|26|2B|2C|3B|3D|2F|3A|40)/gi, decodeURIComponent);
+        return urlTemplate.replace('{pk}', function() {
+            return quoted;
+        });
+    },
+    knownObjects: function(bounds) {
+        // objects out of the window are forgotten, the rest are reported to the server
+        var that = this;
+        var known = [];
+        $.each(this._objects || {}, function(pk, layer) {
+            var layerBounds = layer.getBounds();
+            if(layerBounds.isValid() && bounds.intersects(layerBounds)) {
+                known.push(pk);
+            } else {
+                that.removeGeoObject(pk);
+            }
+        });
+        return known;
+    },
+    removeGeoObject: function(pk) {
+        var layer = (this._objects || {})[pk];
+        if(typeof(layer) != 'undefined') {
+            this.removeLayer(layer);
+            delete this._objects[pk];
+        }
+    },
+    addDecoration: function(layer) {
+        this._decorations = this._decorations || [];
+        this._decorations.push(layer);
+        return this.addLayer(layer);
+    },
+    clearDecorations: function() {
+        var that = this;
+        $.each(this._decorations || [], function(k, layer) {
+            that.removeLayer(layer);
+        });
+        this._decorations = [];
+    },
+    addCluster: function(cluster) {
+        debug("geoobject:debug")("GeoObjectList: add cluster",cluster);
+        var that = this;
+        var size = 30 + 6 * Math.min(Math.floor(Math.log10(cluster.count)), 5);
+        var bounds = L.latLngBounds(
+            [cluster.bbox[1], cluster.bbox[0]],
+            [cluster.bbox[3], cluster.bbox[2]]
+        );
+        this.addDecoration(
+            L.marker([cluster.centroid[1], cluster.centroid[0]], {
+                icon: L.divIcon({
+                    html: '<div><span>' + cluster.count + '</span></div>',
+                    className: 'geoadmin-cluster',
+                    iconSize: L.point(size, size),
+                }),
+            }).bindTooltip(
+                that.clusterTooltipContent(cluster)
+            ).on('click', function() {
+                that.map.fitBounds(bounds, {maxZoom: that.map.getZoom() + 4});
+            })
+        );
+    },
+    clusterTooltipContent: function(cluster) {
+        return '<b>' + cluster.count + '</b> ' + cluster.verbose_name;
     },
     addGeoObject: function(options) {
         debug("geoobject:debug")("GeoObjectList: add",options);
         var that = this;
-        this.addLayer(
+        var layer = L.featureGroup();
+        $.each(options.geo.features || [], function(k, feature) {
+            var properties = that.featureProperties(feature);
+            var canvas = properties.options.render == 'canvas';
             L.geoJSON(
-                options.geo,
+                feature,
                 {
+                    renderer: canvas ? that.canvasRenderer() : undefined,
                     pointToLayer: function(geoJsonPoint, latlng) {
+                        if(canvas) {
+                            return L.circleMarker(latlng, $.extend(
+                                {radius: 5, renderer: that.canvasRenderer()},
+                                properties.options.style
+                            ));
+                        }
                         return L.marker(latlng, {
-                            icon: L.BeautifyIcon.icon(geoJsonPoint.properties.options.icon),
+                            icon: L.BeautifyIcon.icon(properties.options.icon),
                         })
                     },
                     style: function(geoJsonFeature) {
-                        return geoJsonFeature.properties.options.style;
+                        return properties.options.style;
                     },
-                    onEachFeature: function(feature, layer) {
-                        layer.bindTooltip(that.featureTooltipContent(options, feature))
-                    }
                 },
-            ).bindPopup(
-                L.responsivePopup().setContent(
-                     that.geoObjectPopupContent(options)
-                )
-            )
+            ).bindTooltip(function() {
+                return that.featureTooltipContent(options, feature);
+            }).addTo(layer);
+        });
+        var popup = L.responsivePopup().setContent(function() {
+            return that.geoObjectPopupContent(options);
+        });
+        layer.bindPopup(popup);
+        if(this.options.lazyDetails) {
+            layer.on('popupopen', function() {
+                that.loadDetails(options.pk).then(function(details) {
+                    popup.setContent(that.geoObjectDetailsContent(details));
+                    popup.update();
+                });
+            });
+        }
+        this._objects = this._objects || {};
+        this._objects[String(options.pk)] = layer;
+        this.addLayer(layer);
+        return layer;
+    },
+    canvasRenderer: function() {
+        // the single canvas is shared by all objects rendered using it
+        if(typeof(this._canvas) == 'undefined') {
+            this._canvas = L.canvas({padding: 0.5});
+        }
+        return this._canvas;
+    },
+    featureProperties: function(feature) {
+        return $.extend(
+            {options: {}},
+            (this._fields || {})[feature.properties.name],
+            feature.properties
         );
     },
     featureTooltipContent: function(options, feature) {
-        return '<b>' + options.title + '</b><br/>' +
-            '<ul><li>' + feature.properties.verbose_name +
+        return (typeof(options.title) != 'undefined' ? '<b>' + options.title + '</b><br/>' : '') +
+            '<ul><li>' + this.featureProperties(feature).verbose_name +
             '</ul>';
     },
     geoObjectPopupContent: function(options) {
+        if(typeof(options.title) == 'undefined') {
+            return '<i class="fa fa-spinner fa-spin"></i>';
+        }
         var content = '<a href="'+options.url+'" target="_blank">'+
                     options.title+
                     '</a><b/><br/>';
         return content;
     },
+    geoObjectDetailsContent: function(details) {
+        if(typeof(details.popup) != 'undefined') {
+            return details.popup;
+        }
+        return this.geoObjectPopupContent(details);
+    },
+    detailUrl: function(pk) {
+        // the primary key is quoted as the admin does for the change URL
+        var quoted = String(pk).replace(/[":\/_#?;@&=+$,\[\]<>%\n\\]/g, function(c) {
+            return '_' + ('0' + c.charCodeAt(0).toString(16).toUpperCase()).slice(-2);
+        });
+        return this.fetchUrl().replace(/\/?$/, '/') + encodeURIComponent(quoted);
+    },
+    loadDetails: function(pk) {
+        this._details = this._details || {};
+        if(typeof(this._details[pk]) == 'undefined') {
+            var that = this;
+            this._details[pk] = $.ajax({url: this.detailUrl(pk)}).fail(function() {
+                delete that._details[pk];
+            });
+        }
+        return this._details[pk];
+    },
 })
+GeoObjectTileLayer = function(options) {
+    var styles = {};
+    $.each(options.fields, function(name, field) {
+        styles[name] = $.extend({
+            radius: 5,
+            weight: 1,
+            color: 'red',
+            fill: true,
+            fillOpacity: 0.5,
+        }, field.options.style);
+    });
+    var layer = L.vectorGrid.protobuf(options.url, {
+        rendererFactory: L.canvas.tile,
+        vectorTileLayerStyles: styles,
+        interactive: true,
+        minZoom: options.minZoom,
+        attribution: options.attribution,
+        getFeatureId: function(feature) {
+            return feature.properties.pk;
+        },
+    });
+    layer.on('click', function(e) {
+        debug("geoobject:debug")("GeoObjectTile: click",e.layer.properties);
+        var field = options.fields[e.layer.properties.field] || {};
+        var url = options.changeUrl.replace('{pk}', e.layer.properties.pk);
+        L.responsivePopup().setLatLng(e.latlng).setContent(
+            '<a href="' + url + '" target="_blank">' +
+            (field.verbose_name || '') + ' #' + e.layer.properties.pk +
+            '</a><b/><br/>'
+        ).openOn(layer._map);
+    });
+    return layer;
+};
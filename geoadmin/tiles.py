@@ -0,0 +1,73 @@
+import math
+
+
+#: maximal latitude covered by the web mercator tile grid
+MAX_LATITUDE = 85.0511287798066
+#: half of the web mercator (EPSG:3857) world size in meters
+MERCATOR_HALF_SIZE = 20037508.342789244
+
+
+def tile_count(z):
+    """Number of tiles along one side of the grid on the zoom level"""
+    return 1 << z
+
+
+def tile_valid(z, x, y):
+    """Checks whether the tile exists in the grid"""
+    return 0 <= z <= 30 and 0 <= x < tile_count(z) and 0 <= y < tile_count(z)
+
+
+def lon_to_x(lon, z):
+    """Converts longitude to the fractional tile X coordinate"""
+    return (lon + 180.) / 360. * tile_count(z)
+
+
+def lat_to_y(lat, z):
+    """Converts latitude to the fractional tile Y coordinate"""
+    lat = max(min(lat, MAX_LATITUDE), -MAX_LATITUDE)
+    rad = math.radians(lat)
+    return (1. - math.log(math.tan(rad) + 1. / math.cos(rad)) / math.pi) / 2. * tile_count(z)
+
+
+def x_to_lon(x, z):
+    """Converts the fractional tile X coordinate to longitude"""
+    return x / tile_count(z) * 360. - 180.
+
+
+def y_to_lat(y, z):
+    """Converts the fractional tile Y coordinate to latitude"""
+    return math.degrees(math.atan(math.sinh(math.pi * (1. - 2. * y / tile_count(z)))))
+
+
+def tile_bounds(z, x, y):
+    """Returns south, west, north, east bounds of the tile"""
+    return y_to_lat(y + 1, z), x_to_lon(x, z), y_to_lat(y, z), x_to_lon(x + 1, z)
+
+
+def tile_mercator_bounds(z, x, y):
+    """Returns xmin, ymin, xmax, ymax bounds of the tile in the web mercator projection"""
+    size = 2. * MERCATOR_HALF_SIZE / tile_count(z)
+    return (
+        -MERCATOR_HALF_SIZE + x * size,
+        MERCATOR_HALF_SIZE - (y + 1) * size,
+        -MERCATOR_HALF_SIZE + (x + 1) * size,
+        MERCATOR_HALF_SIZE - y * size,
+    )
+
+
+def zoom_for_window(south, west, north, east, max_zoom=20):
+    """Returns the zoom level having the tile size comparable with the window size"""
+    size = max(abs(north - south), abs(east - west))
+    if size <= 0:
+        return max_zoom
+    return max(0, min(max_zoom, int(math.floor(math.log(360. / size, 2)))))
+
+
+def tiles_covering(south, west, north, east, z):
+    """Returns a list of (x, y) tiles of the zoom level covering the window"""
+    last = tile_count(z) - 1
+    x0 = max(0, min(last, int(lon_to_x(west, z))))
+    x1 = max(0, min(last, int(lon_to_x(east, z))))
+    y0 = max(0, min(last, int(lat_to_y(north, z))))
+    y1 = max(0, min(last, int(lat_to_y(south, z))))
+    return [(x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1)]
@@ -0,0 +1,65 @@
+import time
+from contextlib import contextmanager
+
+
+@contextmanager
+def untimed():
+    """Context manager doing nothing, used when timing is off"""
+    yield
+
+
+class Timings(object):
+    """Durations of the request processing phases, number of queries and size of the response"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.durations = {}
+        self.queries = 0
+        self.query_duration = 0.
+        self.bytes = 0
+
+    @contextmanager
+    def phase(self, name):
+        """Context manager adding the duration of the block to the phase"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.durations[name] = self.durations.get(name, 0.) + time.perf_counter() - started
+
+    @contextmanager
+    def counting(self, connection):
+        """Context manager counting queries executed by the connection inside the block"""
+        with connection.execute_wrapper(self.execute_wrapper):
+            yield
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        """Database execute wrapper counting queries and their duration"""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.query_duration += time.perf_counter() - started
+
+    def total(self):
+        """Returns the time passed since the start of the request processing"""
+        return time.perf_counter() - self.started
+
+    def as_dict(self):
+        """Returns durations in milliseconds with the number of queries and the response size"""
+        result = {name: round(duration * 1000., 3) for name, duration in self.durations.items()}
+        result.update({
+            'db': round(self.query_duration * 1000., 3),
+            'total': round(self.total() * 1000., 3),
+            'queries': self.queries,
+            'bytes': self.bytes,
+        })
+        return result
+
+    def header(self):
+        """Returns the Server-Timing header value"""
+        metrics = ['%s;dur=%.3f' % (name, duration * 1000.) for name, duration in self.durations.items()]
+        metrics.append('db;dur=%.3f;desc="%d queries"' % (self.query_duration * 1000., self.queries))
+        metrics.append('total;dur=%.3f;desc="%d bytes"' % (self.total() * 1000., self.bytes))
+        return ', '.join(metrics)
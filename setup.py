@@ -20,6 +20,8 @@ setup(
         'Framework :: Django :: 2.1',
         'Framework :: Django :: 2.2',
         'Framework :: Django :: 3.0',
+        'Framework :: Django :: 3.1',
+        'Framework :: Django :: 3.2',
         "Programming Language :: Python :: 3.6",
         "Programming Language :: Python :: 3.7",
         'License :: OSI Approved :: GNU Library or Lesser General Public License (LGPL)',
@@ -31,6 +33,7 @@ setup(
         'geoadmin': [
             'templates/geoadmin/geoadmin_change_list.html',
             'templates/geoadmin/geoadmin_view.html',
+            'templates/geoadmin/geoadmin_popup.html',
             'static/geoadmin/geoadmin.css',
             'static/geoadmin/geoadmin.js',
         ]
@@ -42,4 +45,11 @@ setup(
         "django-leaflet",
         "geojson",
     ],
+    extras_require={
+        "brotli": ["brotli"],
+        "zstd": ["zstandard"],
+        "orjson": ["orjson"],
+        "rapidjson": ["python-rapidjson"],
+        "ujson": ["ujson"],
+    },
 )